@@ -0,0 +1,199 @@
+"""
+Synthetic message storm against the real XP and sparkle handlers.
+
+Drives XPTracker and Sparkle through the message pipeline with fake
+messages, guilds and members against a throwaway SQLite file. Nothing
+touches the network. Run from the repository root:
+
+    python -m benchmarks.message_storm --guilds 20 --users 5000 --rate 2000
+
+Reports throughput, p50/p99 dispatch and per-handler latency and commits
+per second so hot-path changes can be compared run to run. Handler
+percentiles come from the utils.perf histograms, so they are bucket upper
+bounds. Dispatch latency includes time queued behind other messages; with
+--rate 0 every message is queued up front, so it measures that backlog
+rather than the handlers.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import xp_cooldown_seconds, xp_flush_interval, xp_flush_max_entries
+from utils import database
+from utils.perf import perf
+from utils.pipeline import MessagePipeline
+from utils.ratelimit import TokenBucketLimiter
+from utils.xp_buffer import XPBuffer
+from events.xp import XPTracker
+from events.sparkle import Sparkle
+from commands.ranks import RankSystem
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+
+class FakeMember:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.name = f"user-{user_id}"
+        self.display_name = self.name
+        self.bot = False
+
+class FakeMessage:
+    """Just enough of discord.Message for the message handlers"""
+
+    def __init__(self, guild: FakeGuild, author: FakeMember, api_latency: float):
+        self.guild = guild
+        self.author = author
+        self.content = "hello"
+        self.mentions = []
+        self._api_latency = api_latency
+
+    async def add_reaction(self, emoji):
+        await asyncio.sleep(self._api_latency)
+
+    async def reply(self, content=None, **kwargs):
+        await asyncio.sleep(self._api_latency)
+
+class CountingLimiter(TokenBucketLimiter):
+    """Token bucket that counts rejected hits"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limited = 0
+
+    def hit(self, key, now=None) -> bool:
+        allowed = super().hit(key, now)
+        self.limited += not allowed
+        return allowed
+
+class PrintLogger:
+    async def log(self, message: str, level: str = "info"):
+        print(f"[{level}] {message}", file=sys.stderr)
+
+class FakeBot:
+    def __init__(self):
+        self.logger = PrintLogger()
+        self._blacklisted_users = set()
+        self.message_pipeline = MessagePipeline(self)
+        self.xp_limiter = CountingLimiter(rate=1 / xp_cooldown_seconds)
+        self.xp_buffer = XPBuffer(
+            self.logger,
+            flush_interval=xp_flush_interval,
+            max_entries=xp_flush_max_entries
+        )
+        self.cogs = {}
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+    async def add_cog(self, cog):
+        self.cogs[type(cog).__name__] = cog
+        if hasattr(cog, "cog_load"):
+            await cog.cog_load()
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[round(fraction * (len(sorted_values) - 1))]
+
+async def run(args):
+    rng = random.Random(args.seed)
+    guilds = [FakeGuild(100_000 + i) for i in range(args.guilds)]
+    members = [FakeMember(1_000_000 + i) for i in range(args.users)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await database.init_db(os.path.join(tmp, "storm.db"))
+        bot = FakeBot()
+        tracker = XPTracker(bot)
+        await bot.add_cog(tracker)
+        await bot.add_cog(Sparkle(bot))
+        await bot.add_cog(RankSystem(bot))
+        bot.xp_buffer.start()
+        
+        latencies = []
+        # Keys that have hit the limiter, so a repeat is a cooldown hit
+        warm = []
+        warm_seen = set()
+        
+        async def deliver(message):
+            start = time.perf_counter()
+            await bot.message_pipeline.dispatch(message)
+            latencies.append(time.perf_counter() - start)
+        
+        perf.clear()
+        commits_before = database.commit_count()
+        tasks = []
+        start = time.perf_counter()
+        for i in range(args.messages):
+            if args.rate:
+                delay = start + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif i % 100 == 0:
+                await asyncio.sleep(0)
+            
+            guild = rng.choice(guilds)
+            if warm and rng.random() < args.cooldown_hit_ratio:
+                author = rng.choice(warm)
+            else:
+                author = rng.choice(members)
+                # Make sure this one passes the cooldown
+                bot.xp_limiter.forget(tracker.cooldown_key(author.id, guild.id))
+                if author.id not in warm_seen:
+                    warm_seen.add(author.id)
+                    warm.append(author)
+            
+            tasks.append(asyncio.create_task(deliver(FakeMessage(guild, author, args.api_latency))))
+        
+        await asyncio.gather(*tasks)
+        dispatched = time.perf_counter() - start
+        await bot.xp_buffer.close()
+        elapsed = time.perf_counter() - start
+        commits = database.commit_count() - commits_before
+        await database.close_pool()
+
+    latencies.sort()
+    print(f"messages        {args.messages:,} across {args.guilds} guilds / {args.users:,} users")
+    print(f"cooldown hits   {bot.xp_limiter.limited / args.messages:.1%} (target {args.cooldown_hit_ratio:.0%})")
+    print(f"elapsed         {elapsed:.3f}s (dispatch {dispatched:.3f}s + final flush)")
+    print(f"throughput      {args.messages / elapsed:,.0f} msg/s")
+    print(f"dispatch p50    {percentile(latencies, 0.50) * 1000:.3f} ms")
+    print(f"dispatch p99    {percentile(latencies, 0.99) * 1000:.3f} ms")
+    print(f"dispatch max    {latencies[-1] * 1000 if latencies else 0:.3f} ms")
+    print(f"commits         {commits} ({commits / elapsed:,.1f}/s)")
+    histograms = perf.snapshot()
+    for name, (calls, total, worst, failures) in bot.message_pipeline.timings.items():
+        histogram = histograms.get(f"handler:{name}")
+        p50, p99 = (histogram.percentile(0.50), histogram.percentile(0.99)) if histogram else (0.0, 0.0)
+        mean = total / calls * 1000 if calls else 0
+        print(
+            f"handler {name:<8}calls={calls:,} p50<={p50:.3f} ms p99<={p99:.3f} ms "
+            f"mean={mean:.3f} ms max={worst * 1000:.3f} ms failures={failures}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--rate", type=float, default=2000,
+                        help="messages per second; 0 queues every message at once, "
+                             "so dispatch latency measures that queue")
+    parser.add_argument("--cooldown-hit-ratio", type=float, default=0.8,
+                        help="fraction of messages from users still on XP cooldown")
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="seconds each fake reaction/reply takes")
+    parser.add_argument("--seed", type=int, default=None)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
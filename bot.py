@@ -1,25 +1,79 @@
+import asyncio
 import os
 import time
 import signal
 import random
 import discord
+from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
-from config import pronouns, status
+from config import (
+    pronouns, status,
+    xp_flush_interval, xp_flush_max_entries, xp_cooldown_seconds,
+    log_file, log_max_bytes, log_backup_count, log_sample_rates,
+    metrics_host, metrics_port,
+    lazy_extensions_enabled, lazy_extensions
+)
 from utils.logger import BotLogger
-from utils.database import init_db, close_pool
+from utils.log_sink import setup_log_sink
+from utils.database import init_db, close_pool, describe_tuning, read, write, commit_count
+from utils.xp_buffer import XPBuffer
+from utils.leaderboard import xp_leaderboard
+from utils.migrations import get_schema_version
+from utils.pipeline import MessagePipeline
+from utils.ratelimit import TokenBucketLimiter, load_cooldowns, save_cooldowns
+from utils.perf import perf
+from utils.metrics import metrics, MetricsExporter
+from utils.extensions import (
+    ExtensionTiming, SourceFingerprints, TimedLoader,
+    core_paths, discover_extensions, describe_timings, extension_path
+)
 
 load_dotenv()
 
+class TimedContext(commands.Context):
+    """Context that remembers when it was created and times its sends"""
+
+    def __init__(self, **attrs):
+        super().__init__(**attrs)
+        self.started_at = time.perf_counter()
+
+    async def send(self, *args, **kwargs):
+        with perf.timed("discord:send"):
+            return await super().send(*args, **kwargs)
+
+class LazyCommandTree(app_commands.CommandTree):
+    """Loads a deferred extension before dispatching the first slash command that needs it"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.type in (discord.InteractionType.application_command, discord.InteractionType.autocomplete):
+            await self.client.load_lazy_command(interaction.data.get("name"))
+        return True
+
 class MyBot(commands.Bot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.db_pool = None
         self.logger = None
+        self.log_listener = None
+        self.xp_buffer = None
+        self.metrics_exporter = None
+        self.extension_timings = {}
+        self.source_fingerprints = SourceFingerprints()  # as of the last (re)load; see /reload_commands
+        self._lazy_commands = {}  # command name -> extension not loaded yet
+        self._lazy_lock = asyncio.Lock()
+        self.xp_limiter = TokenBucketLimiter(rate=1 / xp_cooldown_seconds)
         self._restart_requested = False
         self._blacklisted_users = set()
+        self.message_pipeline = MessagePipeline(self)
+        self.add_listener(self.message_pipeline.dispatch, "on_message")
         signal.signal(signal.SIGTERM, self.handle_signal)
 
+    @property
+    def deferred_extensions(self):
+        """Lazy extensions that haven't been loaded yet"""
+        return set(self._lazy_commands.values())
+
     @property
     def blacklisted_users(self):
         return self._blacklisted_users.copy()
@@ -30,6 +84,58 @@ class MyBot(commands.Bot):
     async def remove_from_blacklist(self, user_id: int):
         self._blacklisted_users.discard(user_id)
 
+    async def get_context(self, origin, /, *, cls=TimedContext):
+        # Hybrid app commands build their context through here as well
+        ctx = await super().get_context(origin, cls=cls)
+        if ctx.command is None and ctx.invoked_with in self._lazy_commands:
+            if await self.load_lazy_command(ctx.invoked_with):
+                ctx = await super().get_context(origin, cls=cls)
+        return ctx
+
+    async def _load_from_module_spec(self, spec, key):
+        # Every extension load goes through here; time import and setup separately.
+        # Setup is wall-clock: under gather it includes other loads that ran meanwhile.
+        loader = spec.loader = TimedLoader(spec.loader)
+        start = time.perf_counter()
+        await super()._load_from_module_spec(spec, key)
+        setup_seconds = time.perf_counter() - start - loader.seconds
+        self.extension_timings[key] = ExtensionTiming(key, loader.seconds * 1000, setup_seconds * 1000)
+
+    async def load_lazy_command(self, command_name: str) -> bool:
+        """
+        Load the deferred extension that provides `command_name`
+        Returns: True if one was loaded
+        """
+        extension = self._lazy_commands.get(command_name)
+        if extension is None:
+            return False
+        async with self._lazy_lock:
+            if extension in self.extensions:
+                return False
+            try:
+                await self.load_extension(extension)
+            except Exception as e:
+                await self.logger.log(f"Failed to load {extension}: {e}", level="error")
+                return False
+            for name in [name for name, ext in self._lazy_commands.items() if ext == extension]:
+                del self._lazy_commands[name]
+        timing = self.extension_timings[extension]
+        await self.logger.log(
+            f"Lazily loaded {extension} in {timing.import_ms + timing.setup_ms:.1f} ms",
+            level="info"
+        )
+        return True
+
+    async def load_lazy_extensions(self):
+        """Load every extension still deferred, e.g. before syncing slash commands"""
+        for command_name in list(self._lazy_commands):
+            await self.load_lazy_command(command_name)
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        # Every listener, cog or not, is run through here
+        with perf.timed(f"listener:{getattr(coro, '__qualname__', event_name)}"):
+            await super()._run_event(coro, event_name, *args, **kwargs)
+
     async def is_not_blacklisted(self, ctx):
         if ctx.author.id in self._blacklisted_users:
             fake_errors = [
@@ -49,43 +155,84 @@ class MyBot(commands.Bot):
 
     async def setup_hook(self):
         self.add_check(self.is_not_blacklisted)
+        self.log_listener = setup_log_sink(
+            log_file,
+            max_bytes=log_max_bytes,
+            backup_count=log_backup_count,
+            sample_rates=log_sample_rates
+        )
         self.logger = BotLogger(self, log_channel_id=1353840766694457454)
         
         try:
             self.db_pool = await init_db("data/nova.db")
+            self.xp_buffer = XPBuffer(
+                self.logger,
+                flush_interval=xp_flush_interval,
+                max_entries=xp_flush_max_entries
+            )
+            self.xp_buffer.start()
+            
+            metrics.gauge_callback("guilds", lambda: len(self.guilds))
+            metrics.gauge_callback("xp_buffer_pending", lambda: len(self.xp_buffer))
+            metrics.gauge_callback("db_commits_total", commit_count)
+            if metrics_port:
+                self.metrics_exporter = MetricsExporter(metrics, metrics_host, metrics_port)
+                await self.metrics_exporter.start()
             
-            async with self.db_pool.acquire() as conn:
+            async with read() as conn:
                 async with conn.cursor() as cur:
                     await cur.execute("SELECT user_id FROM blacklist")
                     rows = await cur.fetchall()
                     self._blacklisted_users.update(int(row[0]) for row in rows)
+                await load_cooldowns(conn, self.xp_limiter)
+                await self.message_pipeline.load_optouts(conn)
+                await xp_leaderboard.warm(conn)
+            
+            # Report the writer's settings; journal_mode is only set there
+            async with write() as conn:
+                schema_version = await get_schema_version(conn)
+                tuning = await describe_tuning(conn)
             
             await self.logger.log(
                 f"Loaded {len(self._blacklisted_users)} blacklisted users", 
                 level="info"
             )
             
-            folders = ["commands", "events", "tasks"]
-            for folder in folders:
-                for filename in os.listdir(folder):
-                    if filename.endswith(".py") and not filename.startswith("_"):
-                        try:
-                            await self.load_extension(f"{folder}.{filename[:-3]}")
-                        except Exception as e:
-                            await self.logger.log(
-                                f"Failed to load {folder}.{filename[:-3]}: {e}",
-                                level="error"
-                            )
-
+            extensions = discover_extensions()
+            deferred = lazy_extensions if lazy_extensions_enabled else {}
+            for extension, command_names in deferred.items():
+                if extension in extensions:
+                    self._lazy_commands.update(dict.fromkeys(command_names, extension))
+            eager = [name for name in extensions if name not in self._lazy_commands.values()]
+            
+            # Extensions don't depend on each other at load time, so any setup
+            # that awaits (e.g. a cog_load query) overlaps with the others
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(self.load_extension(name) for name in eager),
+                return_exceptions=True
+            )
+            load_ms = (time.perf_counter() - start) * 1000
+            for name, result in zip(eager, results):
+                if isinstance(result, BaseException):
+                    await self.logger.log(f"Failed to load {name}: {result}", level="error")
+            loaded = [self.extension_timings[name] for name in eager if name in self.extensions]
+            deferred_names = sorted(self.deferred_extensions)
+            self.source_fingerprints.record([*core_paths(), *(extension_path(name) for name in extensions)])
+            
             startup_msg = (
                 f"**Bot {'restarted' if self._restart_requested else 'started'}**\n"
                 f"• User: {self.user}\n"
                 f"• Guilds: {len(self.guilds)}\n"
-                f"• Blacklisted users: {len(self._blacklisted_users)}"
+                f"• Blacklisted users: {len(self._blacklisted_users)}\n"
+                f"• Schema version: {schema_version}\n"
+                f"• SQLite: {tuning}\n"
+                f"• Extensions: {describe_timings(loaded, load_ms)}"
+                + (f"\n• Deferred: {', '.join(deferred_names)}" if deferred_names else "")
             )
             await self.logger.log(startup_msg, level="startup")
             self._restart_requested = False
-
+        
         except Exception as e:
             await self.logger.log(
                 f"Startup failed: {e}", 
@@ -101,7 +248,26 @@ class MyBot(commands.Bot):
                 f"**Shutting down**\nUptime: {uptime:.2f} seconds",
                 level="shutdown"
             )
+        if self.xp_buffer:
+            # Stop taking grants first: one that arrived after the final flush
+            # would spend a cooldown token and then never be written
+            self.message_pipeline.unregister("xp")
+            try:
+                await self.xp_buffer.close()
+            except Exception as e:
+                print(f"Final XP flush failed: {e}")
+        if self.db_pool:
+            try:
+                async with write() as conn:
+                    await save_cooldowns(conn, self.xp_limiter)
+            except Exception as e:
+                print(f"Saving cooldowns failed: {e}")
         await close_pool()
+        if self.metrics_exporter:
+            await self.metrics_exporter.close()
+        await self.logger.close()
+        if self.log_listener:
+            self.log_listener.stop()
         await super().close()
 
 intents = discord.Intents.default()
@@ -112,6 +278,7 @@ intents.members = True
 bot = MyBot(
     command_prefix="++",
     intents=intents,
+    tree_cls=LazyCommandTree,
     activity=discord.Activity(
         type=discord.ActivityType.watching,
         name=f"{status} | Pronouns: {pronouns}"
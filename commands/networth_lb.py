@@ -2,99 +2,75 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from discord.utils import escape_markdown
-from typing import Tuple
+from typing import List, Tuple
+from utils.pagination import KEYSET_AFTER, LeaderboardPages, keyset_params, send_leaderboard
+
+async def fetch_net_worth_rows(conn, server_id: str, after, limit: int) -> List[Tuple[str, int, int, int]]:
+    """
+    (user_id, net_worth, coins, rank_value) rows after the keyset cursor,
+    best first. Candidates are current members with XP in this server.
+    """
+    # Sought on idx_user_xp_server_net_worth; coins are joined for the page only
+    keyset = " AND " + KEYSET_AFTER.format(score="net_worth") if after else ""
+    return await conn.fetchall(
+        """SELECT ux.user_id, ux.net_worth, COALESCE(uc.coins, 0) AS coins,
+            ux.net_worth - COALESCE(uc.coins, 0) AS rank_value
+        FROM (
+            SELECT user_id, net_worth FROM user_xp
+            WHERE server_id = ? AND active = 1""" + keyset + """
+            ORDER BY net_worth DESC, user_id
+            LIMIT ?
+        ) ux
+        LEFT JOIN user_coins uc ON uc.user_id = ux.user_id
+        ORDER BY ux.net_worth DESC, ux.user_id""",
+        (server_id, *(keyset_params(after) if after else ()), limit))
 
 class NetWorthLeaderboard(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.rank_values = {
-            "cutie": 1000,
-            "goddess": 10000,
-            "uwu": 3000,
-            "smol": 2000,
-            "bean": 4000,
-            "divine": 15000,
-            "legendary": 20000,
-            "potato": 1000,
-            "angel": 5000,
-            "bunny": 3500,
-            "princess": 8000
-        }
-
-    async def calculate_net_worth(self, user_id: str, conn) -> Tuple[int, int, int]:
-        """Calculate a user's total net worth and components"""
-        async with conn.cursor() as cur:
-            await cur.execute(
-                "SELECT coins FROM user_coins WHERE user_id = ?",
-                (user_id,)
-            )
-            coins_result = await cur.fetchone()
-            coins = coins_result[0] if coins_result else 0
-            
-            await cur.execute(
-                "SELECT rank_name FROM user_ranks WHERE user_id = ? AND rank_type = 'purchased'",
-                (user_id,)
-            )
-            ranks = await cur.fetchall()
-            rank_value = sum(self.rank_values.get(rank[0].lower(), 0) for rank in ranks)
-            
-            return coins + rank_value, coins, rank_value
+        self.pages = LeaderboardPages(fetch_net_worth_rows)
 
-    @commands.hybrid_command(name="networthlb", aliases=["nwlb"], 
+    @commands.hybrid_command(name="networthlb", aliases=["nwlb"],
                             description="Show server net worth leaderboard (coins + rank values)")
-    @app_commands.describe(limit="Number of users to show (max 20)")
-    async def networth_leaderboard(self, ctx: commands.Context, limit: int = 10):
+    @app_commands.describe(limit="Users per page (max 20)", page="Page to start on")
+    async def networth_leaderboard(self, ctx: commands.Context, limit: int = 10, page: int = 1):
         limit = max(1, min(20, limit))
+        guild = ctx.guild
         
-        guild_member_ids = {str(member.id) for member in ctx.guild.members}
-        
-        if not guild_member_ids:
-            await ctx.send("This server has no members to display.", ephemeral=True)
-            return
-            
-        async with self.bot.db_pool.acquire() as conn:
-            member_data = []
-            for user_id in guild_member_ids:
-                net_worth, coins, rank_value = await self.calculate_net_worth(user_id, conn)
-                member_data.append((user_id, net_worth, coins, rank_value))
-            
-            member_data.sort(key=lambda x: x[1], reverse=True)
-            top_results = member_data[:limit]
-                
-            if not top_results:
-                await ctx.send("No net worth data available for members of this server.", ephemeral=True)
-                return
-            
+        def render(results, first_rank: int, page_number: int) -> discord.Embed:
             embed = discord.Embed(
-                title=f"{escape_markdown(ctx.guild.name)} Net Worth Leaderboard",
+                title=f"{escape_markdown(guild.name)} Net Worth Leaderboard",
                 color=discord.Color.gold())
             
-            user_id, net_worth, coins, rank_value = top_results[0]
-            user = ctx.guild.get_member(int(user_id))
-            
-            if user:
-                embed.add_field(
-                    name=f"#1 {escape_markdown(user.display_name)}",
-                    value=(
-                        f"**Coins:** {coins:,}\n"
-                        f"**Rank Value:** {rank_value:,}\n"
-                        f"**Total:** {net_worth:,}"
-                    ),
-                    inline=False
-                )
-                embed.set_thumbnail(url=user.display_avatar.url)
-            
-            for rank, (user_id, net_worth, _, _) in enumerate(top_results[1:], 2):
-                user = ctx.guild.get_member(int(user_id))
-                display_name = escape_markdown(user.display_name) if user else f"Unknown User ({user_id})"
+            for rank, (user_id, net_worth, coins, rank_value) in enumerate(results, first_rank):
+                user = guild.get_member(int(user_id))
+                
+                if rank == 1:
+                    if user:
+                        embed.add_field(
+                            name=f"#1 {escape_markdown(user.display_name)}",
+                            value=(
+                                f"**Coins:** {coins:,}\n"
+                                f"**Rank Value:** {rank_value:,}\n"
+                                f"**Total:** {net_worth:,}"
+                            ),
+                            inline=False
+                        )
+                        embed.set_thumbnail(url=user.display_avatar.url)
+                    continue
                 
+                display_name = escape_markdown(user.display_name) if user else f"Unknown User ({user_id})"
                 embed.add_field(
                     name=f"{rank}. {display_name}",
                     value=f"Total: {net_worth:,}",
                     inline=False)
             
-            embed.set_footer(text="Net worth = coins + value of purchased ranks")
-            await ctx.send(embed=embed)
+            embed.set_footer(text=f"Net worth = coins + value of purchased ranks • Page {page_number}")
+            return embed
+        
+        await send_leaderboard(
+            ctx, self.pages, render, limit, page,
+            "No net worth data available for members of this server.")
 
 async def setup(bot):
     await bot.add_cog(NetWorthLeaderboard(bot))
\ No newline at end of file
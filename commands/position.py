@@ -0,0 +1,83 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from discord.utils import escape_markdown
+from typing import Optional, Tuple
+from utils.database import read
+
+# Rank = 1 + rows ahead in "score DESC, user_id" order among current
+# members, i.e. the same rows and order the leaderboards use. Each COUNT is
+# a range seek on the covering (server_id, score DESC, user_id) partial
+# index that only touches entries ranked above the user, never the rest of
+# the guild's rows.
+POSITION = """
+    SELECT {score},
+        1 + (SELECT COUNT(*) FROM {table} WHERE server_id = ?1 AND active = 1
+                AND {score} > me.{score})
+          + (SELECT COUNT(*) FROM {table} WHERE server_id = ?1 AND active = 1
+                AND {score} = me.{score} AND user_id < ?2)
+    FROM {table} me WHERE server_id = ?1 AND user_id = ?2 AND active = 1
+"""
+
+XP_POSITION = POSITION.format(table="user_xp", score="xp")
+# net_worth is kept per guild on user_xp (see migration 5)
+NET_WORTH_POSITION = POSITION.format(table="user_xp", score="net_worth")
+
+SPARKLE_POSITION = """
+    SELECT epic + rare + regular,
+        1 + (SELECT COUNT(*) FROM sparkles WHERE server_id = ?1 AND active = 1
+                AND epic + rare + regular > me.epic + me.rare + me.regular)
+          + (SELECT COUNT(*) FROM sparkles WHERE server_id = ?1 AND active = 1
+                AND epic + rare + regular = me.epic + me.rare + me.regular AND user_id < ?2)
+    FROM sparkles me WHERE server_id = ?1 AND user_id = ?2 AND active = 1
+"""
+
+class Position(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def get_positions(self, server_id: str, user_id: str) -> Tuple[Optional[tuple], ...]:
+        """
+        (score, rank) for XP, sparkles and net worth, or None where the user
+        has no data in this server or has left it
+        """
+        async with read() as conn:
+            results = []
+            for query in (XP_POSITION, SPARKLE_POSITION, NET_WORTH_POSITION):
+                row = await conn.fetchone(query, (server_id, user_id))
+                results.append((row[0], row[1]) if row else None)
+        return tuple(results)
+
+    @commands.hybrid_command(name="position", description="See where you stand on the server leaderboards")
+    @app_commands.describe(user="User to look up (defaults to you)")
+    async def position(self, ctx: commands.Context, user: Optional[discord.User] = None):
+        target = user or ctx.author
+        xp, sparkles, net_worth = await self.get_positions(str(ctx.guild.id), str(target.id))
+        
+        if not any((xp, sparkles, net_worth)):
+            return await ctx.send(
+                f"{escape_markdown(target.display_name)} isn't on any leaderboard here yet!",
+                ephemeral=True
+            )
+        
+        embed = discord.Embed(
+            title=f"{escape_markdown(target.display_name)}'s Leaderboard Positions",
+            color=discord.Color.gold()
+        )
+        
+        for name, result, unit in (
+            ("XP", xp, "XP"),
+            ("Sparkles", sparkles, "sparkles"),
+            ("Net Worth", net_worth, "total"),
+        ):
+            embed.add_field(
+                name=name,
+                value=f"#{result[1]:,} ({result[0]:,} {unit})" if result else "Unranked",
+                inline=True
+            )
+        
+        embed.set_thumbnail(url=target.display_avatar.url)
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Position(bot))
\ No newline at end of file
@@ -2,129 +2,108 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from typing import Dict, List, Optional, Tuple
-from utils.database import get_connection
+from utils.database import read, write
+from utils.xp import calculate_level
+from utils.profile_cache import profile_cache
+from utils.ranks import (
+    SHOP_RANKS, LEVEL_RANKS,
+    achieved_level_ranks, current_level_rank, next_level_rank, level_ranks_between
+)
 
 class RankSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         
         # Level-based ranks
-        self.level_ranks = {
-            0: "Nova Seed",
-            5: "Blossoming Nova",
-            10: "Starlight Sprite",
-            15: "Celestial Bloom",
-            20: "Luminous Petal",
-            25: "Galactic Lily",
-            30: "Cosmic Rose",
-            35: "Nebula Orchid",
-            40: "Supernova Dahlia",
-            45: "Quasar Peony",
-            50: "Pulsar Primrose",
-            55: "Andromeda Azalea",
-            60: "Infinity Iris",
-            65: "Eternal Violet",
-            70: "Paradise Magnolia",
-            75: "Dreamweaver Lotus",
-            80: "Mystic Marigold",
-            85: "Enchanted Tulip",
-            90: "Divine Daffodil",
-            95: "Transcendent Camellia",
-            100: "Ultimate Nova"
-        }
+        self.level_ranks = LEVEL_RANKS
         
         # Purchasable ranks and their prices
-        self.shop_ranks = {
-            "cutie": 1000,
-            "goddess": 10000,
-            "uwu": 3000,
-            "smol": 2000,
-            "bean": 4000,
-            "divine": 15000,
-            "legendary": 20000,
-            "potato": 1000,
-            "angel": 5000,
-            "bunny": 3500,
-            "princess": 8000
-        }
+        self.shop_ranks = SHOP_RANKS
 
     def _calculate_level_from_xp(self, xp: int) -> int:
         """Calculate level based on XP using progressive scaling"""
-        level = 0
-        xp_needed = 100
-        while xp >= xp_needed:
-            xp -= xp_needed
-            level += 1
-            xp_needed = int(xp_needed * 1.2)
-        return level
+        return calculate_level(xp)[0]
 
     def get_all_achieved_level_ranks(self, level: int) -> List[str]:
         """Get all level ranks achieved up to current level"""
-        return [rank for lvl, rank in sorted(self.level_ranks.items()) if lvl <= level]
+        return list(achieved_level_ranks(level))
+
+    def get_level_ranks_between(self, old_level: int, new_level: int) -> List[str]:
+        """Level ranks unlocked by going from old_level to new_level"""
+        return list(level_ranks_between(old_level, new_level))
 
     def get_current_level_rank(self, level: int) -> str:
         """Get the highest rank achieved for current level"""
-        achieved = self.get_all_achieved_level_ranks(level)
-        return achieved[-1] if achieved else "Nova Seed"
+        return current_level_rank(level) or "Nova Seed"
 
     def get_next_level_rank(self, level: int) -> Optional[Tuple[int, str]]:
         """Get the next rank to achieve (level threshold and name)"""
-        for lvl, rank in sorted(self.level_ranks.items()):
-            if lvl > level:
-                return (lvl, rank)
-        return None
+        return next_level_rank(level)
 
-    async def _ensure_level_ranks(self, user_id: str, xp: int):
-        """Ensure user has all appropriate level ranks in database"""
-        level = self._calculate_level_from_xp(xp)
-        achieved_ranks = self.get_all_achieved_level_ranks(level)
-        
-        async with await get_connection() as conn:
-            async with conn.cursor() as cur:
-                # Insert missing level ranks
-                for rank_name in achieved_ranks:
-                    await cur.execute('''
-                        INSERT OR IGNORE INTO user_ranks 
-                        (user_id, rank_name, rank_type)
-                        VALUES (?, ?, 'level')
-                    ''', (str(user_id), rank_name))
-                await conn.commit()
+    async def grant_level_ranks(self, conn, user_id: str, old_level: int, new_level: int) -> List[str]:
+        """Insert just the ranks crossed on a level up, in the caller's transaction"""
+        ranks = self.get_level_ranks_between(old_level, new_level)
+        if ranks:
+            await self._insert_level_ranks(conn, user_id, ranks)
+        return ranks
+
+    async def _insert_level_ranks(self, conn, user_id: str, rank_names: List[str]) -> int:
+        """Insert missing level ranks; returns how many were new"""
+        async with conn.cursor() as cur:
+            await cur.executemany(
+                "INSERT OR IGNORE INTO user_ranks (user_id, rank_name, rank_type) VALUES (?, ?, 'level')",
+                [(str(user_id), rank_name) for rank_name in rank_names])
+            return cur.get_cursor().rowcount
+
+    async def backfill_level_ranks(self, chunk_size: int = 500) -> Tuple[int, int]:
+        """
+        Reconcile level ranks for every user from their best XP across
+        servers, one write transaction per `chunk_size` users so message
+        XP flushes can interleave.
+        Returns: (users checked, ranks inserted)
+        """
+        users = inserted = 0
+        last_user_id = ""
+        while True:
+            async with read() as conn:
+                rows = await conn.fetchall(
+                    """SELECT user_id, MAX(xp) FROM user_xp
+                    WHERE user_id > ? GROUP BY user_id ORDER BY user_id LIMIT ?""",
+                    (last_user_id, chunk_size))
+            if not rows:
+                break
+            
+            async with write() as conn:
+                for user_id, xp in rows:
+                    level = self._calculate_level_from_xp(xp)
+                    inserted += await self._insert_level_ranks(
+                        conn, user_id, self.get_all_achieved_level_ranks(level))
+            
+            for user_id, _ in rows:
+                profile_cache.invalidate_user(user_id)
+            users += len(rows)
+            last_user_id = rows[-1][0]
+        return users, inserted
+
+    @commands.hybrid_command(name="backfill_ranks", description="Reconcile level ranks for all users")
+    @commands.is_owner()
+    async def backfill_ranks(self, ctx: commands.Context):
+        """Grant any level ranks users are missing"""
+        await ctx.defer(ephemeral=True)
+        users, inserted = await self.backfill_level_ranks()
+        await ctx.send(
+            f"✅ Checked {users:,} users, granted {inserted:,} missing level ranks",
+            ephemeral=True
+        )
 
     @commands.hybrid_command(name="myranks", description="View your complete rank progression")
     async def show_my_ranks(self, ctx: commands.Context):
         """Display all earned and purchased ranks"""
-        async with await get_connection() as conn:
-            async with conn.cursor() as cur:
-                # Get user's XP and level
-                await cur.execute(
-                    "SELECT xp FROM user_xp WHERE server_id = ? AND user_id = ?",
-                    (str(ctx.guild.id), str(ctx.author.id))
-                )
-                xp_result = await cur.fetchone()
-                xp = xp_result[0] if xp_result else 0
-                level = self._calculate_level_from_xp(xp)
-                
-                # Get all owned ranks and equipped status
-                await cur.execute('''
-                    SELECT rank_name, is_equipped, rank_type FROM user_ranks
-                    WHERE user_id = ?
-                    ORDER BY
-                        CASE rank_type
-                            WHEN 'level' THEN 0
-                            ELSE 1
-                        END,
-                        rank_name
-                ''', (str(ctx.author.id),))
-                all_ranks = await cur.fetchall()
-                
-                # Get currently equipped rank
-                await cur.execute('''
-                    SELECT rank_name FROM user_ranks
-                    WHERE user_id = ? AND is_equipped = 1
-                ''', (str(ctx.author.id),))
-                equipped_result = await cur.fetchone()
-                equipped_rank = equipped_result[0] if equipped_result else None
-                
+        profile = await profile_cache.get(str(ctx.guild.id), str(ctx.author.id))
+        level = self._calculate_level_from_xp(profile.xp)
+        all_ranks = profile.ranks
+        equipped_rank = profile.equipped_rank
+        
         # Get rank information
         earned_ranks = self.get_all_achieved_level_ranks(level)
         current_rank = self.get_current_level_rank(level)
@@ -227,59 +206,52 @@ class RankSystem(commands.Cog):
             )
         
         price = self.shop_ranks[rank_name]
+        error = None
         
-        async with await get_connection() as conn:
-            async with conn.cursor() as cur:
-                # Check if user already owns the rank
-                await cur.execute(
-                    "SELECT 1 FROM user_ranks WHERE user_id = ? AND rank_name = ?",
-                    (str(ctx.author.id), rank_name)
-                )
-                if await cur.fetchone():
-                    return await ctx.send(
-                        f"You already own the `{rank_name}` rank!",
-                        ephemeral=True
-                    )
-                
-                # Verify and deduct coins
-                await cur.execute(
-                    "SELECT coins FROM user_coins WHERE user_id = ?",
-                    (str(ctx.author.id),)
-                )
-                result = await cur.fetchone()
-                
-                if not result:
-                    return await ctx.send(
-                        "You don't have a coin balance yet!",
-                        ephemeral=True
-                    )
-                
-                if result[0] < price:
-                    return await ctx.send(
-                        f"Not enough coins! You need {price:,} but have {result[0]:,}.",
-                        ephemeral=True
-                    )
-                
-                # Perform the transaction
-                try:
+        # Checks and purchase share one write transaction; replies are sent
+        # after it so the write lock isn't held across Discord calls
+        try:
+            async with write() as conn:
+                async with conn.cursor() as cur:
+                    # Check if user already owns the rank
                     await cur.execute(
-                        "UPDATE user_coins SET coins = coins - ? WHERE user_id = ?",
-                        (price, str(ctx.author.id))
-                    )
-                    
-                    await cur.execute(
-                        """INSERT INTO user_ranks (user_id, rank_name, rank_type, is_equipped)
-                        VALUES (?, ?, 'purchased', 0)""",
-                        (str(ctx.author.id), rank_name))
-                    
-                    await conn.commit()
-                except Exception as e:
-                    await conn.rollback()
-                    await ctx.send(
-                        "❌ Transaction failed! Your coins were not deducted.",
-                        ephemeral=True
+                        "SELECT 1 FROM user_ranks WHERE user_id = ? AND rank_name = ?",
+                        (str(ctx.author.id), rank_name)
                     )
-                    raise e
+                    if await cur.fetchone():
+                        error = f"You already own the `{rank_name}` rank!"
+                    else:
+                        # Verify and deduct coins
+                        await cur.execute(
+                            "SELECT coins FROM user_coins WHERE user_id = ?",
+                            (str(ctx.author.id),)
+                        )
+                        result = await cur.fetchone()
+                        
+                        if not result:
+                            error = "You don't have a coin balance yet!"
+                        elif result[0] < price:
+                            error = f"Not enough coins! You need {price:,} but have {result[0]:,}."
+                        else:
+                            await cur.execute(
+                                "UPDATE user_coins SET coins = coins - ? WHERE user_id = ?",
+                                (price, str(ctx.author.id))
+                            )
+                            
+                            await cur.execute(
+                                """INSERT INTO user_ranks (user_id, rank_name, rank_type, is_equipped)
+                                VALUES (?, ?, 'purchased', 0)""",
+                                (str(ctx.author.id), rank_name))
+        except Exception:
+            await ctx.send(
+                "❌ Transaction failed! Your coins were not deducted.",
+                ephemeral=True
+            )
+            raise
+        
+        if error:
+            return await ctx.send(error, ephemeral=True)
+        profile_cache.invalidate_user(str(ctx.author.id))
         
         await ctx.send(
             f"🎉 Successfully purchased `{rank_name}` rank for {price:,} coins!\n"
@@ -293,7 +265,7 @@ class RankSystem(commands.Cog):
         """Equip a purchased rank to display it"""
         rank_name = rank_name.lower()
         
-        async with await get_connection() as conn:
+        async with write() as conn:
             async with conn.cursor() as cur:
                 # Check if user owns the rank
                 await cur.execute(
@@ -301,25 +273,23 @@ class RankSystem(commands.Cog):
                     (str(ctx.author.id), rank_name))
                 rank_data = await cur.fetchone()
                 
-                if not rank_data:
-                    return await ctx.send(
-                        f"You don't own the `{rank_name}` rank! Purchase it first with `/buyrank`.",
-                        ephemeral=True
-                    )
-                
-                rank_type = rank_data[0]
-                
-                # Unequip all other ranks first (only one can be equipped at a time)
-                await cur.execute(
-                    "UPDATE user_ranks SET is_equipped = 0 WHERE user_id = ?",
-                    (str(ctx.author.id),))
-                
-                # Equip the selected rank
-                await cur.execute(
-                    "UPDATE user_ranks SET is_equipped = 1 WHERE user_id = ? AND rank_name = ?",
-                    (str(ctx.author.id), rank_name))
-                
-                await conn.commit()
+                if rank_data:
+                    # Unequip all other ranks first (only one can be equipped at a time)
+                    await cur.execute(
+                        "UPDATE user_ranks SET is_equipped = 0 WHERE user_id = ?",
+                        (str(ctx.author.id),))
+                    
+                    # Equip the selected rank
+                    await cur.execute(
+                        "UPDATE user_ranks SET is_equipped = 1 WHERE user_id = ? AND rank_name = ?",
+                        (str(ctx.author.id), rank_name))
+        
+        if not rank_data:
+            return await ctx.send(
+                f"You don't own the `{rank_name}` rank! Purchase it first with `/buyrank`.",
+                ephemeral=True
+            )
+        profile_cache.invalidate_user(str(ctx.author.id))
         
         await ctx.send(
             f"✨ You've equipped the `{rank_name}` rank! It will now be displayed on your profile.",
@@ -329,7 +299,7 @@ class RankSystem(commands.Cog):
     @commands.hybrid_command(name="unequiprank", description="Unequip your current rank")
     async def unequip_rank(self, ctx: commands.Context):
         """Remove your currently equipped rank"""
-        async with await get_connection() as conn:
+        async with write() as conn:
             async with conn.cursor() as cur:
                 # Check if user has any rank equipped
                 await cur.execute(
@@ -337,18 +307,18 @@ class RankSystem(commands.Cog):
                     (str(ctx.author.id),))
                 equipped_rank = await cur.fetchone()
                 
-                if not equipped_rank:
-                    return await ctx.send(
-                        "You don't have any rank equipped!",
-                        ephemeral=True
-                    )
-                
-                # Unequip the rank
-                await cur.execute(
-                    "UPDATE user_ranks SET is_equipped = 0 WHERE user_id = ?",
-                    (str(ctx.author.id),))
-                
-                await conn.commit()
+                if equipped_rank:
+                    # Unequip the rank
+                    await cur.execute(
+                        "UPDATE user_ranks SET is_equipped = 0 WHERE user_id = ?",
+                        (str(ctx.author.id),))
+        
+        if not equipped_rank:
+            return await ctx.send(
+                "You don't have any rank equipped!",
+                ephemeral=True
+            )
+        profile_cache.invalidate_user(str(ctx.author.id))
         
         await ctx.send(
             f"✅ You've unequipped your rank. Your level rank will now be displayed.",
@@ -2,7 +2,20 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from discord.utils import escape_markdown
-from typing import Optional
+from typing import List
+from utils.pagination import KEYSET_AFTER, LeaderboardPages, keyset_params, send_leaderboard
+
+async def fetch_sparkle_rows(conn, server_id: str, after, limit: int) -> List[tuple]:
+    """(user_id, total, epic, rare, regular) rows after the keyset cursor, best first"""
+    # Ordered and sought by the idx_sparkles_total expression
+    keyset = " AND " + KEYSET_AFTER.format(score="epic + rare + regular") if after else ""
+    return await conn.fetchall(
+        """SELECT user_id, epic + rare + regular AS total, epic, rare, regular
+           FROM sparkles
+           WHERE server_id = ? AND active = 1""" + keyset + """
+           ORDER BY epic + rare + regular DESC, user_id
+           LIMIT ?""",
+        (server_id, *(keyset_params(after) if after else ()), limit))
 
 class SparkleLeaderboard(commands.Cog):
     def __init__(self, bot):
@@ -12,66 +25,48 @@ class SparkleLeaderboard(commands.Cog):
             "rare": "🌟",  # Rare sparkle
             "regular": "⭐"  # Regular sparkle
         }
+        self.pages = LeaderboardPages(fetch_sparkle_rows)
 
     @commands.hybrid_command(name="sparkleleaderboard", aliases=["sparklelb"], description="Show server Sparkle leaderboard")
-    @app_commands.describe(limit="Number of users to show (max 20)")
-    async def sparkle_leaderboard(self, ctx: commands.Context, limit: int = 10):
+    @app_commands.describe(limit="Users per page (max 20)", page="Page to start on")
+    async def sparkle_leaderboard(self, ctx: commands.Context, limit: int = 10, page: int = 1):
         """Show the sparkle leaderboard with all sparkle types"""
         limit = max(1, min(20, limit))
+        guild = ctx.guild
         
-        # Get current server members
-        guild_member_ids = {str(member.id) for member in ctx.guild.members}
-        
-        if not guild_member_ids:
-            await ctx.send("This server has no members to display.", ephemeral=True)
-            return
+        def render(results, first_rank: int, page_number: int) -> discord.Embed:
+            embed = discord.Embed(
+                title=f"{escape_markdown(guild.name)} Sparkle Leaderboard",
+                color=discord.Color.gold())
             
-        async with await self.bot.db_pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(
-                    """SELECT user_id, epic, rare, regular, 
-                          (epic + rare + regular) as total
-                       FROM sparkles
-                       WHERE server_id = ? AND user_id IN ({})
-                       ORDER BY total DESC LIMIT ?"""
-                       .format(','.join(['?']*len(guild_member_ids))),
-                    (str(ctx.guild.id), *guild_member_ids, limit)
-                )
-                results = await cur.fetchall()
-                
-                if not results:
-                    await ctx.send("No sparkle data available for members of this server.", ephemeral=True)
-                    return
+            for rank, (user_id, total, epic, rare, regular) in enumerate(results, first_rank):
+                user = guild.get_member(int(user_id))
+                display_name = escape_markdown(user.display_name) if user else f"Unknown User ({user_id})"
                 
-                embed = discord.Embed(
-                    title=f"{escape_markdown(ctx.guild.name)} Sparkle Leaderboard",
-                    color=discord.Color.gold())
-                
-                for rank, (user_id, epic, rare, regular, total) in enumerate(results, 1):
-                    user = ctx.guild.get_member(int(user_id))
-                    display_name = escape_markdown(user.display_name) if user else f"Unknown User ({user_id})"
-                    
-                    # Format sparkle counts with the correct emojis
-                    sparkles = (
-                        f"{self.sparkle_emojis['epic']} {epic} (Epic) | "
-                        f"{self.sparkle_emojis['rare']} {rare} (Rare) | "
-                        f"{self.sparkle_emojis['regular']} {regular} (Regular) | "
-                        f"**Total:** {total}"
-                    )
-                    
-                    embed.add_field(
-                        name=f"{rank}. {display_name}",
-                        value=sparkles,
-                        inline=False)
-                    
-                    # Set thumbnail to top user's avatar
-                    if rank == 1 and user:
-                        embed.set_thumbnail(url=user.display_avatar.url)
+                # Format sparkle counts with the correct emojis
+                sparkles = (
+                    f"{self.sparkle_emojis['epic']} {epic} (Epic) | "
+                    f"{self.sparkle_emojis['rare']} {rare} (Rare) | "
+                    f"{self.sparkle_emojis['regular']} {regular} (Regular) | "
+                    f"**Total:** {total}"
+                )
                 
-                # Add footer with sparkle types
-                embed.set_footer(text="✨ Epic | 🌟 Rare | ⭐ Regular")
+                embed.add_field(
+                    name=f"{rank}. {display_name}",
+                    value=sparkles,
+                    inline=False)
                 
-                await ctx.send(embed=embed)
+                # Set thumbnail to top user's avatar
+                if rank == 1 and user:
+                    embed.set_thumbnail(url=user.display_avatar.url)
+            
+            # Add footer with sparkle types
+            embed.set_footer(text=f"✨ Epic | 🌟 Rare | ⭐ Regular • Page {page_number}")
+            return embed
+        
+        await send_leaderboard(
+            ctx, self.pages, render, limit, page,
+            "No sparkle data available for members of this server.")
 
 async def setup(bot):
     await bot.add_cog(SparkleLeaderboard(bot))
\ No newline at end of file
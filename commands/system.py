@@ -1,10 +1,19 @@
+import asyncio
+import time
 import discord
 import random
 import logging
 from discord.ext import commands
 from discord import app_commands
 from typing import Optional
-from utils.database import init_db, close_pool
+from utils.database import reopen_db, read, write
+from utils.pipeline import ALL_HANDLERS
+from utils.leaderboard import xp_leaderboard
+from utils.profile_cache import profile_cache
+from utils.log_sink import tail_log, paginate_lines
+from utils.perf import perf
+from utils.extensions import core_paths, discover_extensions, extension_path
+from config import log_file
 
 log = logging.getLogger('nova')
 
@@ -19,46 +28,101 @@ class SystemCommands(commands.Cog):
     @commands.hybrid_command(name="sync_commands")
     @app_commands.check(is_owner)
     async def sync(self, ctx: commands.Context):
+        # Deferred extensions' slash commands would otherwise be unregistered
+        await ctx.bot.load_lazy_extensions()
         await ctx.bot.tree.sync()
         await ctx.send("Slash commands synced!")
 
     @commands.hybrid_command(name="reload_commands")
     @app_commands.check(is_owner)
-    async def reload_commands(self, ctx: commands.Context):
-        """Reload ALL extensions (commands + events + tasks) safely"""
+    @app_commands.describe(full="Reload every extension, reopen the database and rebuild the caches")
+    async def reload_commands(self, ctx: commands.Context, full: bool = False):
+        """
+        Reload the extensions whose source changed since they were loaded,
+        keeping the database connections and caches. utils/ and config.py
+        are never re-imported, so while they differ from what the bot started
+        with (new migrations included) the reply says a restart is needed.
+        """
         try:
-            await close_pool()
+            fingerprints = self.bot.source_fingerprints
+            discover_extensions.cache_clear()
+            available = discover_extensions()
+            loaded = list(self.bot.extensions)
+            deferred = self.bot.deferred_extensions
+            paths = {name: extension_path(name) for name in {*available, *loaded}}
+            
+            # Core files are only recorded at startup, so this keeps warning until a restart
+            changed_core = fingerprints.changed(core_paths())
+            changed = set(fingerprints.changed(paths.values()))
+            
+            to_unload = [name for name in loaded if name not in available]
+            to_reload = [
+                name for name in loaded
+                if name in available and (full or paths[name] in changed)
+            ]
+            to_load = [
+                name for name in available
+                if name not in loaded and name not in deferred and paths[name] in changed
+            ]
+            if not (full or to_unload or to_reload or to_load):
+                message = "✅ No extension changes to reload"
+                if changed_core:
+                    message += f"\n{self._restart_notice(changed_core)}"
+                return await ctx.send(message, ephemeral=True)
+            
+            start = time.perf_counter()
+            if full:
+                # Commit buffered XP, then swap connections; nothing waits on a closed pool
+                await self.bot.xp_buffer.flush()
+                self.bot.db_pool = await reopen_db("data/nova.db")
             
-            extensions = list(self.bot.extensions.keys())
             success = []
             failed = []
+            for action, names in (
+                (self.bot.unload_extension, to_unload),
+                (self.bot.reload_extension, to_reload),
+                (self.bot.load_extension, to_load),
+            ):
+                for ext in names:
+                    try:
+                        await action(ext)
+                        success.append(ext)
+                        fingerprints.record([paths[ext]])
+                    except Exception as e:
+                        failed.append(f"{ext}: {str(e)}")
+            # Deferred extensions import whatever is on disk when first used
+            fingerprints.record(paths[name] for name in deferred if paths.get(name) in changed)
             
-            for ext in extensions:
-                try:
-                    await self.bot.reload_extension(ext)
-                    success.append(ext.split('.')[0])
-                except Exception as e:
-                    failed.append(f"{ext}: {str(e)}")
-            
-            self.bot.db_pool = await init_db("data/nova.db")
+            if full:
+                xp_leaderboard.clear()
+                profile_cache.clear()
+                async with read() as conn:
+                    await xp_leaderboard.warm(conn)
+            elapsed_ms = (time.perf_counter() - start) * 1000
             
-            message = "🔄 Reload Results:\n"
+            message = f"🔄 {'Full' if full else 'Incremental'} reload in {elapsed_ms:.0f} ms\n"
+            if changed_core:
+                message += f"{self._restart_notice(changed_core)}\n"
             if success:
-                message += f"✅ {len(success)} extensions in {len(set(success))} categories\n"
+                message += f"✅ {len(success)}: {', '.join(success)}\n"
             if failed:
-                message += f"❌ Failed: {len(failed)}\n```{'\n'.join(failed)}```"
+                failures = "\n".join(failed)
+                message += f"❌ Failed: {len(failed)}\n```{failures}```"
             
             await ctx.send(message, ephemeral=True)
-            log.info(f"Reloaded {len(success)} extensions")
-
+            log.info(f"{'Full' if full else 'Incremental'} reload of {len(success)} extensions")
+        
         except Exception as e:
+            # reopen_db only swaps in connections that opened, so the old ones still work
             await ctx.send(f"💥 Critical error: {str(e)}", ephemeral=True)
             log.error(f"Reload failed: {e}")
-            
-            try:
-                self.bot.db_pool = await init_db("data/nova.db")
-            except Exception as db_error:
-                log.critical(f"Database reconnect failed: {db_error}")
+
+    @staticmethod
+    def _restart_notice(changed_core) -> str:
+        return (
+            f"⚠️ Core files changed: {', '.join(changed_core)} "
+            f"(restart to run the new code and migrations)"
+        )
 
     @commands.hybrid_command(name="announce")
     @commands.is_owner()
@@ -77,16 +141,54 @@ class SystemCommands(commands.Cog):
 
     @commands.hybrid_command(name="logs")
     @commands.is_owner()
-    async def get_logs(self, ctx, lines: int = 20):
+    @app_commands.describe(
+        lines="Number of entries to show (max 500)",
+        level="Minimum level, e.g. warning",
+        command="Only entries for this command"
+    )
+    async def get_logs(self, ctx, lines: int = 20, level: Optional[str] = None, command: Optional[str] = None):
         """Get recent logs"""
+        lines = max(1, min(500, lines))
         try:
-            with open("logs/bot.log", "r") as f:
-                log_lines = f.readlines()[-lines:]
-            await ctx.send(f"```\n{''.join(log_lines)}\n```", ephemeral=True)
+            log_lines = await asyncio.to_thread(tail_log, log_file, lines, level, command)
+            if not log_lines:
+                return await ctx.send("No matching log entries", ephemeral=True)
+            
+            for page in paginate_lines(log_lines):
+                await ctx.send(f"```\n{page}\n```", ephemeral=True)
         except Exception as e:
             await ctx.send(f"❌ Error: {e}", ephemeral=True)
             log.error(f"Log retrieval failed: {e}")
 
+    @commands.hybrid_command(name="perf")
+    @commands.is_owner()
+    @app_commands.describe(
+        minutes="Only the last N minutes (max 60); omit for since startup",
+        kind="Only one kind: command, listener, handler, db or discord",
+        limit="Number of rows to show (max 50)"
+    )
+    async def perf_report(self, ctx, minutes: Optional[int] = None, kind: Optional[str] = None, limit: int = 15):
+        """Show where time is spent, slowest total first"""
+        limit = max(1, min(50, limit))
+        window = max(1, min(60, minutes)) * 60 if minutes else None
+        rows = perf.top(window, limit, prefix=f"{kind.lower()}:" if kind else "")
+        if not rows:
+            return await ctx.send("No timings recorded yet", ephemeral=True)
+        
+        span = f"last {window // 60} min" if window else "since startup"
+        lines = [f"{'name':<36}{'count':>8}{'p50':>9}{'p99':>9}{'max':>9}{'total s':>10}"]
+        for name, histogram in rows:
+            lines.append(
+                f"{name[:35]:<36}{histogram.count:>8}"
+                f"{histogram.percentile(0.5):>9.1f}{histogram.percentile(0.99):>9.1f}"
+                f"{histogram.max:>9.1f}{histogram.total / 1000:>10.2f}"
+            )
+        
+        pages = paginate_lines(lines)
+        await ctx.send(f"Timings in ms, {span}:\n```\n{pages[0]}\n```", ephemeral=True)
+        for page in pages[1:]:
+            await ctx.send(f"```\n{page}\n```", ephemeral=True)
+
     @commands.hybrid_command(name="blacklist")
     @app_commands.check(is_owner)
     async def blacklist_user(self, ctx, user: discord.User, *, reason: Optional[str] = None):
@@ -94,22 +196,21 @@ class SystemCommands(commands.Cog):
         try:
             await self.bot.add_to_blacklist(user.id)
             
-            async with self.bot.db_pool.acquire() as conn:
+            async with write() as conn:
                 async with conn.cursor() as cur:
                     await cur.execute(
                         """INSERT INTO blacklist (user_id, reason, created_at) 
                         VALUES (?, ?, datetime('now'))""",
                         (str(user.id), reason or "No reason provided")
                     )
-                    await conn.commit()
             
             log_msg = f"Blacklisted {user} ({user.id})"
             if reason:
                 log_msg += f" | Reason: {reason}"
-                
+            
             await ctx.send(f"✅ Successfully blacklisted {user.mention}", ephemeral=True)
             await self.bot.logger.log(log_msg, level="moderation")
-            
+        
         except Exception as e:
             await ctx.send(f"❌ Failed to blacklist: {str(e)}", ephemeral=True)
             log.error(f"Blacklist error: {e}", exc_info=True)
@@ -121,30 +222,76 @@ class SystemCommands(commands.Cog):
         try:
             await self.bot.remove_from_blacklist(user.id)
             
-            async with self.bot.db_pool.acquire() as conn:
+            async with write() as conn:
                 async with conn.cursor() as cur:
                     await cur.execute(
                         "DELETE FROM blacklist WHERE user_id = ?",
                         (str(user.id),)
                     )
-                    await conn.commit()
             
             await ctx.send(f"✅ Successfully unblacklisted {user.mention}", ephemeral=True)
             await self.bot.logger.log(
                 f"Unblacklisted {user} ({user.id})", 
                 level="moderation"
             )
-                
+        
         except Exception as e:
             await ctx.send(f"❌ Failed to unblacklist: {str(e)}", ephemeral=True)
             log.error(f"Unblacklist error: {e}", exc_info=True)
 
+    @commands.hybrid_command(name="optout")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.describe(feature="Message feature to disable here (e.g. xp, sparkle, boom, mention, all)")
+    async def optout(self, ctx, feature: str):
+        """Disable a message feature for this server"""
+        feature = feature.lower()
+        valid = self.bot.message_pipeline.handler_names + [ALL_HANDLERS]
+        if feature not in valid:
+            return await ctx.send(
+                f"Unknown feature! Available: {', '.join(f'`{name}`' for name in valid)}",
+                ephemeral=True
+            )
+        
+        try:
+            async with write() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        "INSERT OR IGNORE INTO guild_optouts (server_id, handler) VALUES (?, ?)",
+                        (str(ctx.guild.id), feature)
+                    )
+            self.bot.message_pipeline.opt_out(ctx.guild.id, feature)
+            await ctx.send(f"✅ `{feature}` is now disabled in this server", ephemeral=True)
+        except Exception as e:
+            await ctx.send(f"❌ Failed to opt out: {str(e)}", ephemeral=True)
+            log.error(f"Opt-out error: {e}", exc_info=True)
+
+    @commands.hybrid_command(name="optin")
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.describe(feature="Message feature to re-enable here")
+    async def optin(self, ctx, feature: str):
+        """Re-enable a message feature for this server"""
+        feature = feature.lower()
+        try:
+            async with write() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        "DELETE FROM guild_optouts WHERE server_id = ? AND handler = ?",
+                        (str(ctx.guild.id), feature)
+                    )
+            self.bot.message_pipeline.opt_in(ctx.guild.id, feature)
+            await ctx.send(f"✅ `{feature}` is enabled in this server", ephemeral=True)
+        except Exception as e:
+            await ctx.send(f"❌ Failed to opt in: {str(e)}", ephemeral=True)
+            log.error(f"Opt-in error: {e}", exc_info=True)
+
     @commands.hybrid_command(name="blacklist_info")
     @app_commands.check(is_owner)
     async def blacklist_info(self, ctx, user: Optional[discord.User] = None):
         """View blacklist information"""
         try:
-            async with self.bot.db_pool.acquire() as conn:
+            async with read() as conn:
                 async with conn.cursor() as cur:
                     if user:
                         await cur.execute(
@@ -197,7 +344,7 @@ class SystemCommands(commands.Cog):
                             )
                         
                         await ctx.send(embed=embed, ephemeral=True)
-                        
+        
         except Exception as e:
             await ctx.send(f"❌ Error retrieving blacklist info: {str(e)}", ephemeral=True)
             log.error(f"Blacklist info error: {e}", exc_info=True)
@@ -2,49 +2,67 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from discord.utils import escape_markdown
-from utils.xp import calculate_level
+from typing import List
+from utils.xp import calculate_levels
+from utils.leaderboard import xp_leaderboard as xp_board
+from utils.pagination import KEYSET_AFTER, LeaderboardPages, keyset_params, send_leaderboard
+
+async def fetch_xp_rows(conn, server_id: str, after, limit: int) -> List[tuple]:
+    """(user_id, xp) rows after the keyset cursor, best first"""
+    if after is None and limit <= xp_board.size:
+        # The first chunk comes from the in-memory board, rebuilt here if it
+        # was evicted, cleared by a reload or the guild is new since startup
+        cached = xp_board.get(server_id, limit)
+        if cached is None:
+            await xp_board.rebuild(conn, server_id)
+            cached = xp_board.get(server_id, limit)
+        return cached
+    if after is None:
+        return await conn.fetchall(
+            "SELECT user_id, xp FROM user_xp WHERE server_id = ? AND active = 1 "
+            "ORDER BY xp DESC, user_id LIMIT ?",
+            (server_id, limit))
+    return await conn.fetchall(
+        "SELECT user_id, xp FROM user_xp WHERE server_id = ? AND active = 1 AND "
+        + KEYSET_AFTER.format(score="xp") +
+        " ORDER BY xp DESC, user_id LIMIT ?",
+        (server_id, *keyset_params(after), limit))
 
 class XpLeaderboard(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.pages = LeaderboardPages(fetch_xp_rows)
 
     @commands.hybrid_command(name="xpleaderboard", aliases=["xplb"], description="Show server XP leaderboard")
-    @app_commands.describe(limit="Number of users to show (max 20)")
-    async def xp_leaderboard(self, ctx: commands.Context, limit: int = 10):
+    @app_commands.describe(limit="Users per page (max 20)", page="Page to start on")
+    async def xp_leaderboard(self, ctx: commands.Context, limit: int = 10, page: int = 1):
         limit = max(1, min(20, limit))
+        guild = ctx.guild
         
-        async with self.bot.db_pool.acquire() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(
-                    "SELECT user_id, xp FROM user_xp "
-                    "WHERE server_id = ? "
-                    "ORDER BY xp DESC LIMIT ?",
-                    (str(ctx.guild.id), limit)
-                )
-                results = await cur.fetchall()
-                
-                if not results:
-                    await ctx.send("No XP data available for this server yet.", ephemeral=True)
-                    return
+        def render(results, first_rank: int, page_number: int) -> discord.Embed:
+            embed = discord.Embed(
+                title=f"{escape_markdown(guild.name)} XP Leaderboard",
+                color=discord.Color.gold())
+            
+            levels = calculate_levels(xp for _, xp in results)
+            for rank, ((user_id, xp), level) in enumerate(zip(results, levels), first_rank):
+                user = guild.get_member(int(user_id))
+                display_name = escape_markdown(user.display_name) if user else f"Unknown User ({user_id})"
                 
-                embed = discord.Embed(
-                    title=f"{escape_markdown(ctx.guild.name)} XP Leaderboard",
-                    color=discord.Color.gold())
+                embed.add_field(
+                    name=f"{rank}. {display_name}",
+                    value=f"Level {level} | {xp:,} XP",
+                    inline=False)
                 
-                for rank, (user_id, xp) in enumerate(results, 1):
-                    user = ctx.guild.get_member(int(user_id))
-                    level, _ = calculate_level(xp)
-                    display_name = escape_markdown(user.display_name) if user else f"Unknown User ({user_id})"
-                    
-                    embed.add_field(
-                        name=f"{rank}. {display_name}",
-                        value=f"Level {level} | {xp:,} XP",
-                        inline=False)
-                    
-                    if rank == 1 and user:
-                        embed.set_thumbnail(url=user.display_avatar.url)
-                
-                await ctx.send(embed=embed)
+                if rank == 1 and user:
+                    embed.set_thumbnail(url=user.display_avatar.url)
+            
+            embed.set_footer(text=f"Page {page_number}")
+            return embed
+        
+        await send_leaderboard(
+            ctx, self.pages, render, limit, page,
+            "No XP data available for this server yet.")
 
 async def setup(bot):
     await bot.add_cog(XpLeaderboard(bot))
\ No newline at end of file
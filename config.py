@@ -1,2 +1,56 @@
 pronouns = "she/her"
-status = "over things"
\ No newline at end of file
+status = "over things"
+
+# XP write-behind buffer: flush every N seconds or once M users are pending
+xp_flush_interval = 1.0
+xp_flush_max_entries = 500
+
+# XP cooldown: one grant per user every N seconds (optionally per guild)
+xp_cooldown_seconds = 10
+xp_cooldown_per_guild = False
+
+# In-memory XP leaderboard: rows kept per guild, guilds kept before LRU eviction
+xp_leaderboard_size = 50
+xp_leaderboard_max_guilds = 1000
+
+# Local JSONL log (read by /logs); rotated by size, DEBUG records sampled
+log_file = "logs/bot.log"
+log_max_bytes = 10 * 1024 * 1024
+log_backup_count = 5
+log_sample_rates = {"DEBUG": 0.1}
+
+# SQLite settings applied to every pooled connection (see utils/database.py)
+sqlite_tuning = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,  # negative = KiB, so 64 MiB
+    "mmap_size": 268435456,  # 256 MiB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000  # ms
+}
+
+# Read-only connections for queries; writes use one dedicated connection
+reader_pool_size = 4
+
+# /stats and /myranks profile cache: entries kept, seconds before a reload
+profile_cache_size = 5000
+profile_cache_ttl = 120
+
+# Paginated leaderboards: seconds a guild's cached result window lives, guilds kept,
+# rows a window holds (also how deep the page option can jump)
+leaderboard_window_ttl = 30
+leaderboard_window_guilds = 200
+leaderboard_window_rows = 500
+
+# Prometheus text endpoint at http://metrics_host:metrics_port/metrics; None disables it
+metrics_host = "127.0.0.1"
+metrics_port = None
+
+# Load these extensions on the first use of one of their commands instead of at
+# startup (extension -> command names). /sync_commands loads them first so their
+# slash commands stay registered.
+lazy_extensions_enabled = False
+lazy_extensions = {
+    "commands.send_message": ("send_message",),
+    "commands.whoareyou": ("whoareyou",)
+}
\ No newline at end of file
@@ -2,52 +2,65 @@ import discord
 from discord.ext import commands
 import logging
 import time
+from typing import Optional
+from utils.metrics import metrics
+from utils.perf import perf
 
 class CommandLogger(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.log = logging.getLogger('nova.commands')
 
+    def _context_fields(self, ctx) -> dict:
+        return {
+            'command': ctx.command.qualified_name if ctx.command else None,
+            'user_id': ctx.author.id,
+            'guild_id': ctx.guild.id if ctx.guild else None,
+            'channel_id': ctx.channel.id if ctx.channel else None
+        }
+
+    def _record_duration(self, ctx) -> Optional[float]:
+        """Record the command's run time (see TimedContext) and return it in ms"""
+        started_at = getattr(ctx, 'started_at', None)
+        if started_at is None or not ctx.command:
+            return None
+        elapsed = time.perf_counter() - started_at
+        perf.observe(f"command:{ctx.command.qualified_name}", elapsed)
+        return round(elapsed * 1000, 2)
+
     @commands.Cog.listener()
     async def on_command(self, ctx):
-        """Logs when any command is invoked"""
+        """Logs when any command is invoked (local log only)"""
+        if not self.log.isEnabledFor(logging.INFO):
+            return
         try:
             # Get command arguments
             args = " ".join([str(arg) for arg in ctx.args[2:]])  # Skip self and ctx
             kwargs = " ".join([f"{k}={v}" for k,v in ctx.kwargs.items()])
             
-            await self.bot.logger.log(
-                f"⚡ Command executed: {ctx.command.qualified_name}\n"
-                f"User: {ctx.author} (ID: {ctx.author.id})\n"
-                f"Server: {ctx.guild.name if ctx.guild else 'DM'}\n"
-                f"Channel: {ctx.channel.name if hasattr(ctx.channel, 'name') else 'DM'}\n"
-                f"Arguments: {args} {kwargs}",
-                level="info"
+            self.log.info(
+                "Command executed: %s by %s", ctx.command.qualified_name, ctx.author,
+                extra={**self._context_fields(ctx), 'args': f"{args} {kwargs}".strip()}
             )
         except Exception as e:
-            await self.bot.logger.log(
-                f"❌ Command logging failed: {str(e)}",
-                level="error"
-            )
+            self.log.error(f"Command logging failed: {str(e)}")
 
     @commands.Cog.listener()
     async def on_command_completion(self, ctx):
-        """Logs when a command completes successfully"""
-        try:
-            await self.bot.logger.log(
-                f"✅ Command completed: {ctx.command.qualified_name}\n"
-                f"User: {ctx.author} (ID: {ctx.author.id})",
-                level="debug"
-            )
-        except Exception as e:
-            await self.bot.logger.log(
-                f"❌ Completion logging failed: {str(e)}",
-                level="error"
-            )
+        """Logs when a command completes successfully (local log only)"""
+        duration_ms = self._record_duration(ctx)
+        metrics.inc("commands_total", labels=(("command", ctx.command.qualified_name), ("outcome", "ok")))
+        self.log.debug(
+            "Command completed: %s in %s ms", ctx.command.qualified_name, duration_ms,
+            extra={**self._context_fields(ctx), 'duration_ms': duration_ms}
+        )
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx, error):
         """Logs when a command fails"""
+        self._record_duration(ctx)
+        if ctx.command:
+            metrics.inc("commands_total", labels=(("command", ctx.command.qualified_name), ("outcome", "error")))
         try:
             await self.bot.logger.log(
                 f"❌ Command failed: {ctx.command.qualified_name}\n"
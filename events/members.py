@@ -0,0 +1,71 @@
+import discord
+from discord.ext import commands
+from utils.database import write
+from utils.leaderboard import xp_leaderboard
+from utils.members import member_index, set_active, sync_active
+
+class MemberTracker(commands.Cog):
+    """
+    Keeps utils.members.member_index, and the `active` flag the leaderboards
+    and /position filter on, in step with guild joins and leaves
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        # Loaded or reloaded after startup: on_ready won't fire again
+        if self.bot.is_ready():
+            await self.rebuild()
+
+    async def rebuild(self):
+        member_index.clear()
+        for guild in self.bot.guilds:
+            await self.load_guild(guild)
+
+    async def load_guild(self, guild: discord.Guild):
+        """Index a guild's members and catch its rows up with joins and leaves we missed"""
+        member_index.load_guild(guild)
+        async with write() as conn:
+            changed = await sync_active(conn, member_index, guild.id)
+        if changed:
+            xp_leaderboard.invalidate(str(guild.id))
+
+    async def mark_member(self, guild_id: int, user_id: int, active: bool):
+        async with write() as conn:
+            changed = await set_active(conn, str(guild_id), str(user_id), active)
+        if changed:
+            # The board only holds members, so it can't just drop or add one row
+            xp_leaderboard.invalidate(str(guild_id))
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Index every guild once the member lists have been chunked"""
+        await self.rebuild()
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        await self.load_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        # Back from an outage; members may have changed while it was away
+        await self.load_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        member_index.drop(guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        member_index.add(member.guild.id, member.id)
+        await self.mark_member(member.guild.id, member.id, True)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        # The raw event also fires for members that weren't cached
+        member_index.remove(payload.guild_id, payload.user.id)
+        await self.mark_member(payload.guild_id, payload.user.id, False)
+
+async def setup(bot):
+    await bot.add_cog(MemberTracker(bot))
\ No newline at end of file
@@ -8,10 +8,7 @@ async def on_mention(message: discord.Message) -> Optional[discord.Message]:
     Responds when the bot is mentioned
     Returns the sent message if successful, None otherwise
     """
-    if message.author.bot:
-        return None
-    
-    if message.guild and any(mention.id == message.guild.me.id for mention in message.mentions):
+    if any(mention.id == message.guild.me.id for mention in message.mentions):
         try:
             responses = [
                 "You called?",
@@ -28,5 +25,9 @@ async def on_mention(message: discord.Message) -> Optional[discord.Message]:
     return None
 
 async def setup(bot: commands.Bot) -> None:
-    """Add the mention listener to the bot"""
-    bot.add_listener(on_mention, "on_message")
\ No newline at end of file
+    """Add the mention handler to the message pipeline"""
+    bot.message_pipeline.register("mention", on_mention, order=40)
+
+async def teardown(bot: commands.Bot) -> None:
+    """Remove the mention handler from the message pipeline"""
+    bot.message_pipeline.unregister("mention")
\ No newline at end of file
@@ -1,7 +1,8 @@
 import random
 import discord
 from discord.ext import commands
-from utils.database import get_connection
+from utils.database import write
+from utils.metrics import metrics
 
 class Sparkle(commands.Cog):
     def __init__(self, bot):
@@ -12,30 +13,34 @@ class Sparkle(commands.Cog):
             "regular": (100, "⭐", "a **sparkle**")
         }
 
+    async def cog_load(self):
+        self.bot.message_pipeline.register("sparkle", self.handle_message, order=20)
+
+    async def cog_unload(self):
+        self.bot.message_pipeline.unregister("sparkle")
+
     async def _add_sparkle(self, message, sparkle_type):
         emoji, description = self.chances[sparkle_type][1:]
+        metrics.inc("sparkles_awarded_total", labels=(("type", sparkle_type),))
         await message.add_reaction(emoji)
         await message.reply(
             f"**{message.author.name}** got {description}! {emoji}", 
             mention_author=False
         )
 
-        async with await get_connection() as conn:
+        async with write() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     f"""INSERT INTO sparkles (server_id, user_id, {sparkle_type})
                     VALUES (?, ?, 1)
                     ON CONFLICT(server_id, user_id) DO UPDATE SET
-                    {sparkle_type} = {sparkle_type} + 1""",
+                    {sparkle_type} = {sparkle_type} + 1, active = 1""",
                     (str(message.guild.id), str(message.author.id))
                 )
-                await conn.commit()
-
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
 
+    async def handle_message(self, message):
+        """Roll for a sparkle on a message routed by the pipeline"""
+        metrics.inc("sparkles_rolled_total")
         chance = random.randint(1, 1000000)
         
         if chance == 1:
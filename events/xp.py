@@ -1,80 +1,57 @@
-import time
 import discord
 from discord.ext import commands
-from utils.database import get_connection
-from utils.xp import add_xp, calculate_level
+from config import xp_cooldown_per_guild
+from utils.metrics import metrics
+from utils.xp import roll_xp
 
 class XPTracker(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.cooldown_seconds = 10  # 10 second cooldown
 
-    async def check_cooldown(self, user_id: str) -> bool:
+    async def cog_load(self):
+        self.bot.xp_buffer.add_level_up_listener(self._on_level_up)
+        self.bot.message_pipeline.register("xp", self.handle_message, order=10)
+
+    async def cog_unload(self):
+        self.bot.xp_buffer.remove_level_up_listener(self._on_level_up)
+        self.bot.message_pipeline.unregister("xp")
+
+    @staticmethod
+    def cooldown_key(user_id: int, guild_id: int) -> str:
+        return f"{guild_id}:{user_id}" if xp_cooldown_per_guild else str(user_id)
+
+    def check_cooldown(self, user_id: int, guild_id: int) -> bool:
         """Check if user is on cooldown"""
-        async with await get_connection() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute(
-                    "SELECT last_message_time FROM cooldowns WHERE user_id = ?",
-                    (str(user_id),)
-                )
-                row = await cur.fetchone()
-                current_time = time.time()
-                
-                if row and current_time - row[0] < self.cooldown_seconds:
-                    return True
-                
-                await cur.execute(
-                    """INSERT OR REPLACE INTO cooldowns 
-                    VALUES (?, ?)""",
-                    (str(user_id), current_time))
-                await conn.commit()
-                return False
+        return not self.bot.xp_limiter.hit(self.cooldown_key(user_id, guild_id))
 
-    async def _grant_level_up_rewards(self, conn, user_id: str, new_level: int):
-        """Grant coins and update ranks when leveling up"""
+    async def _grant_level_up_rewards(self, conn, user_id: str, old_level: int, new_level: int):
+        """Grant coins and the ranks crossed when leveling up (caller commits)"""
         async with conn.cursor() as cur:
-            # Grant bonus coins (100 per level)
-            bonus = 100 * new_level
+            # Grant bonus coins (100 per level reached)
+            bonus = sum(100 * level for level in range(old_level + 1, new_level + 1))
             await cur.execute(
                 """INSERT INTO user_coins (user_id, coins)
                 VALUES (?, ?)
                 ON CONFLICT(user_id) DO UPDATE SET
                 coins = coins + excluded.coins""",
                 (user_id, bonus))
-            
-            # Update level ranks via RankSystem cog
-            if rank_cog := self.bot.get_cog("RankSystem"):
-                await cur.execute(
-                    "SELECT xp FROM user_xp WHERE user_id = ?",
-                    (user_id,))
-                xp = (await cur.fetchone())[0]
-                await rank_cog._ensure_level_ranks(user_id, xp)
-            
-            await conn.commit()
+        
+        # Only the ranks between the two levels; /backfill_ranks fixes gaps
+        if rank_cog := self.bot.get_cog("RankSystem"):
+            await rank_cog.grant_level_ranks(conn, user_id, old_level, new_level)
+
+    async def _on_level_up(self, conn, server_id: str, user_id: str, old_level: int, new_level: int):
+        """Called by the XP buffer inside its flush transaction"""
+        await self._grant_level_up_rewards(conn, user_id, old_level, new_level)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
+    async def handle_message(self, message):
+        """Grant XP for a message unless its author is on cooldown"""
+        if self.check_cooldown(message.author.id, message.guild.id):
+            metrics.inc("xp_cooldown_hits_total")
             return
         
-        if await self.check_cooldown(message.author.id):
-            return
-            
-        try:
-            async with await get_connection() as conn:
-                new_xp, leveled_up = await add_xp(
-                    conn,
-                    str(message.author.id),
-                    str(message.guild.id))
-                
-                if leveled_up:
-                    level = calculate_level(new_xp)[0]
-                    await self._grant_level_up_rewards(conn, str(message.author.id), level)
-                    
-        except Exception as e:
-            await self.bot.logger.log(
-                f"XP error: {type(e).__name__}: {str(e)}",
-                level="error")
+        metrics.inc("xp_grants_total")
+        self.bot.xp_buffer.add(str(message.guild.id), str(message.author.id), roll_xp())
 
 async def setup(bot):
     await bot.add_cog(XPTracker(bot))
\ No newline at end of file
@@ -1,96 +1,171 @@
 import asqlite
+import asyncio
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
+from typing import Dict, Optional
+from config import sqlite_tuning, reader_pool_size
+from utils.ranks import SHOP_RANKS, NET_WORTH_OF
+from utils.migrations import migrate
+from utils.perf import perf
 
+# All writes go through one connection, serialized by _write_lock; reads
+# use a pool of read-only connections so they never take the write lock.
 _pool = None
+_writer = None
+_write_lock = None
+# write() transactions committed since import
+_commits = 0
 
-async def get_connection():
-    """Get a database connection from the pool"""
-    global _pool
+# PRAGMAs a tuning profile may set
+TUNING_PRAGMAS = ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+
+# Names for the PRAGMAs that read back as numbers
+_PRAGMA_NAMES = {
+    "synchronous": {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"},
+    "temp_store": {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+}
+
+def _apply_tuning(profile: Dict[str, object], conn: sqlite3.Connection, read_only: bool = False):
+    """asqlite `init` hook: runs on each new connection before it is handed out"""
+    for pragma, value in profile.items():
+        if pragma not in TUNING_PRAGMAS:
+            raise ValueError(f"Unsupported SQLite tuning pragma: {pragma}")
+        if read_only and pragma == "journal_mode":
+            continue  # set by the writer; a read-only connection can't change it
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+async def describe_tuning(conn) -> str:
+    """Effective values of the tuning PRAGMAs on a connection"""
+    values = []
+    async with conn.cursor() as cur:
+        for pragma in TUNING_PRAGMAS:
+            await cur.execute(f"PRAGMA {pragma}")
+            row = await cur.fetchone()
+            value = row[0] if row else "?"
+            values.append(f"{pragma}={_PRAGMA_NAMES.get(pragma, {}).get(value, value)}")
+    return ", ".join(values)
+
+@asynccontextmanager
+async def read():
+    """Acquire a read-only connection from the reader pool"""
     if _pool is None:
         raise RuntimeError("Database pool not initialized. Call init_db() first.")
-    return await _pool.acquire()
+    start = time.perf_counter()
+    async with _pool.acquire() as conn:
+        acquired = time.perf_counter()
+        perf.observe("db:read_wait", acquired - start)
+        try:
+            yield conn
+        finally:
+            perf.observe("db:read_hold", time.perf_counter() - acquired)
 
-async def init_db(db_path: str):
-    """Initialize database with connection pool and tables"""
-    global _pool
-    _pool = await asqlite.create_pool(db_path)
-    
-    async with await get_connection() as conn:
-        async with conn.cursor() as cur:
-            # First check if old blacklist table exists without created_at
-            await cur.execute("PRAGMA table_info(blacklist)")
-            columns = [col[1] for col in await cur.fetchall()]
-            
-            # If table exists but is missing columns
-            if columns and 'created_at' not in columns:
-                # Create temporary backup
-                await cur.execute("""
-                    CREATE TABLE IF NOT EXISTS blacklist_backup AS 
-                    SELECT * FROM blacklist
-                """)
-                # Drop old table
-                await cur.execute("DROP TABLE IF EXISTS blacklist")
-                await conn.commit()
+@asynccontextmanager
+async def write():
+    """
+    Run a block on the single writer connection inside a transaction.
+    Concurrent writers queue on the lock (FIFO) instead of failing with
+    'database is locked'. Commits on success, rolls back on error; don't
+    call commit() or rollback() inside the block.
+    """
+    global _commits
+    if _writer is None:
+        raise RuntimeError("Database pool not initialized. Call init_db() first.")
+    start = time.perf_counter()
+    async with _write_lock:
+        acquired = time.perf_counter()
+        perf.observe("db:write_wait", acquired - start)
+        try:
+            async with _writer.transaction():
+                yield _writer
+        finally:
+            perf.observe("db:write_hold", time.perf_counter() - acquired)
+        _commits += 1
 
-            # Create all tables with current schema
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS sparkles (
-                    server_id TEXT,
-                    user_id TEXT,
-                    epic INTEGER DEFAULT 0,
-                    rare INTEGER DEFAULT 0,
-                    regular INTEGER DEFAULT 0,
-                    PRIMARY KEY (server_id, user_id)
-                )
-            """)
-            
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS user_xp (
-                    server_id TEXT,
-                    user_id TEXT,
-                    xp INTEGER DEFAULT 0,
-                    level INTEGER DEFAULT 1,
-                    PRIMARY KEY (server_id, user_id)
-                )
-            """)
-            
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS user_coins (
-                    user_id TEXT PRIMARY KEY,
-                    coins INTEGER DEFAULT 0
-                )
-            """)
+def commit_count() -> int:
+    """Number of write() transactions committed so far"""
+    return _commits
 
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS user_ranks (
-                    user_id TEXT,
-                    rank_name TEXT,
-                    rank_type TEXT,  -- 'level' or 'purchased'
-                    is_equipped INTEGER DEFAULT 0,
-                    PRIMARY KEY (user_id, rank_name, rank_type)
-                )
-            """)
-            
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS cooldowns (
-                    user_id TEXT PRIMARY KEY,
-                    last_message_time REAL
-                )
-            """)
-            
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS blacklist (
-                    user_id TEXT PRIMARY KEY,
-                    reason TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+async def init_db(db_path: str, tuning: Optional[Dict[str, object]] = None):
+    """Open the writer and reader connections and bring the schema up to date"""
+    global _pool, _writer, _write_lock
+    profile = sqlite_tuning if tuning is None else tuning
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    
+    _write_lock = asyncio.Lock()
     
+    # The writer creates the file and schema before any reader opens it
+    async with _write_lock:
+        _writer = await _open_writer(db_path, profile)
+    
+    _pool = await _open_readers(db_path, profile)
     return _pool
 
+async def reopen_db(db_path: str, tuning: Optional[Dict[str, object]] = None):
+    """
+    Replace the writer and reader connections with fresh ones, running
+    migrations again. Queued writes wait on the write lock and reads keep
+    using the old pool until the new one is swapped in, so neither fails
+    while this runs.
+    """
+    global _pool, _writer
+    if _writer is None:
+        return await init_db(db_path, tuning)
+    profile = sqlite_tuning if tuning is None else tuning
+    
+    async with _write_lock:
+        old_writer = _writer
+        _writer = await _open_writer(db_path, profile)
+        await old_writer.close()
+    
+    old_pool, _pool = _pool, await _open_readers(db_path, profile)
+    if old_pool and not old_pool._closed:
+        await old_pool.close()
+    return _pool
+
+async def _open_writer(db_path: str, profile: Dict[str, object]):
+    writer = await asqlite.connect(db_path, init=partial(_apply_tuning, profile))
+    await migrate(writer)
+    await _sync_shop_catalog(writer)
+    return writer
+
+async def _open_readers(db_path: str, profile: Dict[str, object]):
+    return await asqlite.create_pool(
+        f"file:{Path(db_path).resolve().as_posix()}?mode=ro",
+        uri=True,
+        size=reader_pool_size,
+        init=partial(_apply_tuning, profile, read_only=True)
+    )
+
+async def _sync_shop_catalog(conn):
+    """Mirror SHOP_RANKS into the shop_ranks table, writing only on changes"""
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT rank_name, price FROM shop_ranks")
+        if {row[0]: row[1] for row in await cur.fetchall()} == SHOP_RANKS:
+            return
+    
+    async with conn.transaction():
+        async with conn.cursor() as cur:
+            await cur.execute("DELETE FROM shop_ranks")
+            await cur.executemany(
+                "INSERT INTO shop_ranks (rank_name, price) VALUES (?, ?)",
+                list(SHOP_RANKS.items()))
+            # Re-price the stored net worth of everyone owning a shop rank
+            await cur.execute(
+                "UPDATE user_xp SET net_worth = " + NET_WORTH_OF.format(user="user_xp.user_id")
+                + " WHERE user_id IN (SELECT user_id FROM user_ranks WHERE rank_type = 'purchased')")
+
 async def close_pool():
     """Safely close all connections"""
-    global _pool
+    global _pool, _writer
     if _pool and not _pool._closed:
         await _pool.close()
-    _pool = None
\ No newline at end of file
+    _pool = None
+    
+    if _writer is not None:
+        # Let queued writes finish first
+        async with _write_lock:
+            await _writer.close()
+        _writer = None
\ No newline at end of file
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+EXTENSION_FOLDERS = ("commands", "events", "tasks")
+# Shared code and settings every extension imports; a change here needs a restart
+CORE_FOLDERS = ("utils",)
+CORE_FILES = ("config.py",)
+
+class ExtensionTiming(NamedTuple):
+    name: str
+    import_ms: float  # executing the module body, including its imports
+    # Wall-clock time awaiting its setup(bot). Loads run concurrently, so this
+    # includes whatever other extensions ran while the setup was suspended.
+    setup_ms: float
+
+@lru_cache(maxsize=None)
+def discover_extensions(folders: Tuple[str, ...] = EXTENSION_FOLDERS) -> Tuple[str, ...]:
+    """
+    Dotted names of the extension modules in `folders`, read from disk once
+    Folders that don't exist are skipped; call `discover_extensions.cache_clear()`
+    to pick up added or removed files.
+    """
+    names = []
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith(".py") and not filename.startswith("_"):
+                names.append(f"{folder}.{filename[:-3]}")
+    return tuple(names)
+
+def extension_path(name: str) -> str:
+    return name.replace(".", os.sep) + ".py"
+
+def core_paths() -> List[str]:
+    """Source files outside the extensions that they all depend on"""
+    paths = list(CORE_FILES)
+    for folder in CORE_FOLDERS:
+        if os.path.isdir(folder):
+            paths.extend(
+                os.path.join(folder, filename) for filename in sorted(os.listdir(folder))
+                if filename.endswith(".py")
+            )
+    return paths
+
+class Fingerprint(NamedTuple):
+    mtime_ns: int
+    size: int
+    sha256: str
+
+def fingerprint(path: str, previous: Optional[Fingerprint] = None) -> Optional[Fingerprint]:
+    """
+    A file's mtime, size and content hash, or None if it doesn't exist
+    The file is only hashed when its mtime or size differ from `previous`.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if previous is not None and (previous.mtime_ns, previous.size) == (stat.st_mtime_ns, stat.st_size):
+        return previous
+    with open(path, "rb") as source:
+        digest = hashlib.sha256(source.read()).hexdigest()
+    return Fingerprint(stat.st_mtime_ns, stat.st_size, digest)
+
+class SourceFingerprints:
+    """
+    Fingerprint of each source file as of when it was last loaded.
+
+    `changed` compares files against that: a new mtime alone only costs a
+    hash, and a file that was saved without edits is not reported.
+    """
+
+    def __init__(self):
+        self._seen: Dict[str, Fingerprint] = {}
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._seen
+
+    def record(self, paths: Iterable[str]):
+        """Remember the current state of `paths`, e.g. after (re)loading them"""
+        for path in paths:
+            current = fingerprint(path, self._seen.get(path))
+            if current is None:
+                self._seen.pop(path, None)
+            else:
+                self._seen[path] = current
+
+    def changed(self, paths: Iterable[str]) -> List[str]:
+        """Paths added, removed or edited since they were last recorded"""
+        changed = []
+        for path in paths:
+            seen = self._seen.get(path)
+            current = fingerprint(path, seen)
+            if current is None:
+                if seen is not None:
+                    changed.append(path)
+            elif seen is None or current.sha256 != seen.sha256:
+                changed.append(path)
+            elif current != seen:
+                # Touched but identical: keep the new mtime so it isn't hashed again
+                self._seen[path] = current
+        return changed
+
+class TimedLoader:
+    """
+    Stands in for a module spec's loader to time `exec_module`, the import
+    half of loading an extension. It puts the real loader back on the
+    module before running it, so nothing keeps a reference to the wrapper.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self.seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def exec_module(self, module):
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self.seconds = time.perf_counter() - start
+
+def describe_timings(timings: Iterable[ExtensionTiming], wall_ms: float) -> str:
+    """
+    Startup report: totals, then one line per extension, slowest import first.
+    Module bodies run one at a time, so import times add up; setup times are
+    wall-clock and overlap, so they are not summed.
+    """
+    timings = sorted(timings, key=lambda timing: timing.import_ms, reverse=True)
+    import_ms = sum(timing.import_ms for timing in timings)
+    lines = [f"{len(timings)} loaded in {wall_ms:.0f} ms, {import_ms:.0f} ms of it importing"]
+    lines.extend(
+        f"  `{timing.name}` import {timing.import_ms:.1f} ms, setup {timing.setup_ms:.1f} ms wall"
+        for timing in timings
+    )
+    return "\n".join(lines)
\ No newline at end of file
@@ -0,0 +1,131 @@
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from config import xp_leaderboard_size, xp_leaderboard_max_guilds
+
+class _Board:
+    __slots__ = ("rows", "scores")
+
+    def __init__(self):
+        self.rows: List[Tuple[int, str]] = []  # (-xp, user_id), best first
+        self.scores: Dict[str, int] = {}
+
+class XPLeaderboardCache:
+    """
+    Per-guild top-K XP leaderboard kept in memory.
+
+    Boards are built from `user_xp` once (at startup or on first use) and
+    then updated from the new totals reported by every XP grant. XP only
+    ever grows, so a user who is not on a full board can only enter it by
+    passing its last row, and nobody on the board can be overtaken by
+    someone outside it. Boards only hold current members: events/members.py
+    invalidates a guild's board when someone with XP there leaves or comes
+    back. Least recently used guilds are evicted past `max_guilds` and
+    rebuilt on their next lookup.
+    """
+
+    def __init__(self, size: int = 50, max_guilds: int = 1000):
+        self.size = size
+        self.max_guilds = max_guilds
+        self._boards: "OrderedDict[str, _Board]" = OrderedDict()
+        # Grants seen while a guild's board is being rebuilt
+        self._rebuilding: Dict[str, Dict[str, int]] = {}
+
+    def __contains__(self, server_id: str) -> bool:
+        return server_id in self._boards
+
+    def clear(self):
+        self._boards.clear()
+
+    def invalidate(self, server_id: str):
+        self._boards.pop(server_id, None)
+
+    def record(self, server_id: str, user_id: str, xp: int):
+        """Apply a user's new XP total"""
+        board = self._boards.get(server_id)
+        if board is None:
+            pending = self._rebuilding.get(server_id)
+            if pending is not None:
+                pending[user_id] = max(xp, pending.get(user_id, 0))
+            return
+        self._apply(board, user_id, xp)
+
+    def _apply(self, board: _Board, user_id: str, xp: int):
+        rows = board.rows
+        old = board.scores.get(user_id)
+        if old is not None:
+            if old == xp:
+                return
+            del rows[bisect_left(rows, (-old, user_id))]
+        elif len(rows) >= self.size and (-xp, user_id) >= rows[-1]:
+            return
+
+        insort(rows, (-xp, user_id))
+        board.scores[user_id] = xp
+        if len(rows) > self.size:
+            _, dropped = rows.pop()
+            del board.scores[dropped]
+
+    def _store(self, server_id: str, board: _Board):
+        self._boards[server_id] = board
+        self._boards.move_to_end(server_id)
+        while len(self._boards) > self.max_guilds:
+            self._boards.popitem(last=False)
+
+    def get(self, server_id: str, limit: int) -> Optional[List[Tuple[str, int]]]:
+        """Cached (user_id, xp) rows, best first, or None if the guild isn't cached"""
+        board = self._boards.get(server_id)
+        if board is None:
+            return None
+        self._boards.move_to_end(server_id)
+        return [(user_id, -neg_xp) for neg_xp, user_id in board.rows[:limit]]
+
+    async def _fetch_top(self, conn, server_id: str, limit: int) -> List[Tuple[str, int]]:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT user_id, xp FROM user_xp "
+                "WHERE server_id = ? AND active = 1 "
+                "ORDER BY xp DESC, user_id LIMIT ?",
+                (server_id, limit)
+            )
+            return [(row[0], row[1]) for row in await cur.fetchall()]
+
+    async def rebuild(self, conn, server_id: str):
+        """Reload one guild's board from the database"""
+        pending = self._rebuilding.setdefault(server_id, {})
+        try:
+            rows = await self._fetch_top(conn, server_id, self.size)
+            board = _Board()
+            board.rows = [(-xp, user_id) for user_id, xp in rows]
+            board.scores = {user_id: xp for user_id, xp in rows}
+            for user_id, xp in pending.items():
+                if xp > board.scores.get(user_id, -1):
+                    self._apply(board, user_id, xp)
+            self._store(server_id, board)
+        finally:
+            self._rebuilding.pop(server_id, None)
+
+    async def warm(self, conn):
+        """Build boards for every guild in one pass over user_xp"""
+        boards: Dict[str, _Board] = {}
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """SELECT server_id, user_id, xp FROM (
+                    SELECT server_id, user_id, xp,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY server_id ORDER BY xp DESC, user_id
+                        ) AS position
+                    FROM user_xp WHERE active = 1
+                ) WHERE position <= ?""",
+                (self.size,)
+            )
+            for server_id, user_id, xp in await cur.fetchall():
+                board = boards.setdefault(server_id, _Board())
+                board.rows.append((-xp, user_id))
+                board.scores[user_id] = xp
+
+        for server_id, board in boards.items():
+            board.rows.sort()
+            self._store(server_id, board)
+
+xp_leaderboard = XPLeaderboardCache(xp_leaderboard_size, xp_leaderboard_max_guilds)
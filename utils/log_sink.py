@@ -0,0 +1,166 @@
+import json
+import logging
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from queue import SimpleQueue
+from typing import Dict, Optional
+
+# Structured fields copied from `extra=` into each JSON line when present
+EXTRA_FIELDS = ("kind", "command", "user_id", "guild_id", "channel_id", "args", "duration_ms")
+
+class JSONLineFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class LevelSampler(logging.Filter):
+    """Keep only a fraction of records per level, e.g. {"DEBUG": 0.1}"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = {level.upper(): rate for level, rate in rates.items()}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelname, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+class _PassthroughQueueHandler(QueueHandler):
+    """Enqueue the record untouched; formatting happens on the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args now so mutable arguments can't change before the write
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def setup_log_sink(
+    path: str = "logs/bot.log",
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    sample_rates: Optional[Dict[str, float]] = None,
+    logger_name: str = "nova",
+) -> QueueListener:
+    """
+    Send the `logger_name` hierarchy to a size-rotated JSONL file.
+    Records are sampled and queued on the calling thread; formatting and
+    file I/O run on the returned listener's thread. Call `stop()` on it at
+    shutdown to flush.
+    """
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(JSONLineFormatter())
+
+    queue = SimpleQueue()
+    queue_handler = _PassthroughQueueHandler(queue)
+    if sample_rates:
+        queue_handler.addFilter(LevelSampler(sample_rates))
+
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(queue, file_handler)
+    listener.start()
+    return listener
+
+def _level_no(name) -> int:
+    level = logging.getLevelName(str(name).upper())
+    return level if isinstance(level, int) else logging.NOTSET
+
+def _parse(line: str) -> Optional[dict]:
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    return entry if isinstance(entry, dict) else None
+
+def _iter_lines_reversed(path: str, block_size: int):
+    """Yield the lines of a file last to first, reading fixed-size blocks from the end"""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+            lines = chunk.split(b"\n")
+            # The first piece may be the tail of a line that starts earlier
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line.decode("utf-8", errors="replace")
+        if remainder:
+            yield remainder.decode("utf-8", errors="replace")
+
+def tail_log(
+    path: str,
+    lines: int = 20,
+    level: Optional[str] = None,
+    command: Optional[str] = None,
+    block_size: int = 8192,
+) -> list:
+    """
+    Last `lines` entries of a JSONL log, oldest first, read backwards so
+    the cost depends on how far back the matches are, not the file size.
+    `level` keeps entries at or above that level; `command` keeps entries
+    for that command name. Lines that aren't JSON are returned as-is when
+    no filter is given. Blocking: run it in a worker thread.
+    """
+    min_level = _level_no(level) if level else None
+
+    matches = []
+    for line in _iter_lines_reversed(path, block_size):
+        entry = _parse(line)
+        if entry is None:
+            if min_level is None and command is None:
+                matches.append(line)
+        elif min_level is not None and _level_no(entry.get("level")) < min_level:
+            continue
+        elif command is not None and entry.get("command") != command:
+            continue
+        else:
+            matches.append(format_entry(entry))
+        if len(matches) >= lines:
+            break
+
+    matches.reverse()
+    return matches
+
+def format_entry(entry: dict) -> str:
+    """Render a JSONL log entry as one readable line"""
+    command = f" [{entry['command']}]" if entry.get("command") else ""
+    return f"{entry.get('ts', '')[:19]} {entry.get('level', '')}{command} {entry.get('message', '')}"
+
+def paginate_lines(lines: list, page_size: int = 1900) -> list:
+    """Group lines into chunks that fit in one Discord message code block"""
+    pages = []
+    current = []
+    length = 0
+    for line in lines:
+        line = line[:page_size]
+        if current and length + len(line) + 1 > page_size:
+            pages.append("\n".join(current))
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+    if current:
+        pages.append("\n".join(current))
+    return pages
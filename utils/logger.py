@@ -1,68 +1,237 @@
 import time
+import asyncio
+import logging
 import discord
+from typing import Dict, Optional, Tuple
 from discord import Embed
 from discord.ext import commands
+from utils.perf import perf
+
+def _embed_text(message: str, embed: Embed) -> str:
+    """Flatten an embed into plain text for the local log"""
+    parts = [message]
+    if embed.title:
+        parts.append(embed.title)
+    parts.extend(f"{field.name}: {field.value}" for field in embed.fields)
+    return " | ".join(parts)
+
+# Discord limits: 10 embeds and 6000 characters of embed text per message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+# BotLogger levels mapped onto stdlib logging levels for the local sink
+LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'startup': logging.INFO,
+    'shutdown': logging.INFO,
+    'restart': logging.INFO,
+    'moderation': logging.WARNING,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL
+}
+
+# Rare lifecycle notices that are posted to Discord regardless of level
+ALWAYS_POST = {'startup', 'shutdown', 'restart'}
 
 class BotLogger:
-    def __init__(self, bot=None, log_channel_id=None):
+    def __init__(self, bot=None, log_channel_id=None, flush_interval: float = 2.0,
+                 discord_level: int = logging.WARNING, max_queued: int = 100):
         self.bot = bot
         self.log_channel_id = log_channel_id
+        self.flush_interval = flush_interval
+        self.discord_level = discord_level
+        self.max_queued = max_queued
+        self.local = logging.getLogger('nova.bot')
         self.start_time = time.time()
         self._is_restart = False
+        self._channel = None
+        self._queue: asyncio.Queue = None
+        self._sender = None
+        self._carry = None  # embed that didn't fit in the previous message
+        self._closed = False
+        self._queued = asyncio.Event()  # set when an entry is queued or on close
+        self._closing = asyncio.Event()  # cuts the batching wait short on close
+        # Unsent plain entries by (level, message), so repeats bump a count
+        self._repeats: Dict[Tuple[str, str], list] = {}
+        self._dropped = 0  # entries discarded because the queue was full
 
     def set_restart(self, restarting: bool):
         self._is_restart = restarting
 
+    async def _get_channel(self):
+        """Resolve the log channel once, preferring the gateway cache"""
+        if self._channel is None:
+            self._channel = (
+                self.bot.get_channel(self.log_channel_id)
+                or await self.bot.fetch_channel(self.log_channel_id)
+            )
+        return self._channel
+
+    def _build_embed(self, message: str, level: str, embed: Embed = None) -> Embed:
+        formats = {
+            'info': ("📝 Info", 0x3498db),
+            'warning': ("⚠️ Warning", 0xf39c12),
+            'error': ("❌ Error", 0xe74c3c),
+            'debug': ("🐛 Debug", 0x9b59b6),
+            'critical': ("🚨 Critical", 0xe74c3c),
+            'startup': ("🟢 Online", 0x2ecc71),
+            'shutdown': ("🔴 Offline", 0xe74c3c),
+            'restart': ("🟡 Restarting", 0xf1c40f)
+        }
+        
+        header, color = formats.get(level.lower(), ("📌 Log", 0x7289da))
+        
+        if embed is None:
+            embed = Embed(
+                title=header,
+                description=f"```{message[:2000]}```",
+                color=color
+            )
+        else:
+            embed.color = color
+            embed.title = f"{header} | {embed.title}" if embed.title else header
+        
+        embed.timestamp = discord.utils.utcnow()
+        return embed
+
     async def log(self, message: str, level: str = "info", alert: bool = False, embed: Embed = None):
+        """
+        Write a log entry to the local sink and, for warnings and above (or
+        alerts and lifecycle notices), queue it for the log channel. Channel
+        entries are sent in batches every `flush_interval` seconds; alerts
+        are sent immediately. A message repeated before its entry is sent
+        only bumps that entry's count, and past `max_queued` entries new
+        ones are dropped from the channel (not the local log) and counted.
+        """
+        level_no = LEVELS.get(level.lower(), logging.INFO)
+        self.local.log(level_no, message if embed is None else _embed_text(message, embed),
+                       extra={'kind': level.lower()})
+        
+        if not alert and level_no < self.discord_level and level.lower() not in ALWAYS_POST:
+            return
+        
         if not self.bot or not self.log_channel_id:
             print(f"Would log: {message}")  # Fallback print
             return
-            
+        
+        key = None if alert or self._closed or embed is not None else (level.lower(), message)
+        repeat = self._repeats.get(key)
+        if repeat is not None:
+            # Same entry is still waiting to be sent: count it instead of queueing it again
+            repeat[1] += 1
+            repeat[0].set_footer(text=f"Repeated {repeat[1]} times")
+            return
+        
+        try:
+            embed = self._build_embed(message, level, embed)
+        except Exception as e:
+            print(f"Logging failed completely: {e}")
+            return
+        
+        if alert or self._closed:
+            await self._send([embed], content="@here" if alert else None)
+            return
+        
+        if self._sender is None or self._sender.done():
+            self._queue = self._queue or asyncio.Queue(maxsize=self.max_queued)
+            self._sender = asyncio.create_task(self._run_sender())
+        try:
+            self._queue.put_nowait(embed)
+        except asyncio.QueueFull:
+            self._dropped += 1  # it is still in the local log
+            return
+        self._queued.set()
+        if key is not None:
+            self._repeats[key] = [embed, 1]
+
+    async def _run_sender(self):
+        """Send batches until closed, then drain the queue and stop"""
+        while True:
+            if self._carry is None and self._queue.empty():
+                if self._closed:
+                    return
+                self._queued.clear()
+                await self._queued.wait()
+                continue
+            if not self._closed:
+                # Let a batch gather; close() ends the wait early
+                try:
+                    await asyncio.wait_for(self._closing.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if self._carry is None:
+                self._carry = self._queue.get_nowait()
+            batch = self._next_batch()
+            await self._send(batch, content=self._dropped_notice())
+
+    def _next_batch(self):
+        """Pack queued embeds into one message's worth"""
+        batch = [self._carry]
+        size = len(self._carry)
+        self._carry = None
+        while len(batch) < MAX_EMBEDS_PER_MESSAGE and not self._queue.empty():
+            embed = self._queue.get_nowait()
+            if size + len(embed) > MAX_EMBED_CHARS_PER_MESSAGE:
+                self._carry = embed
+                break
+            batch.append(embed)
+            size += len(embed)
+        # Sent from here on, so later repeats start a new entry
+        sent = {id(embed) for embed in batch}
+        self._repeats = {key: repeat for key, repeat in self._repeats.items() if id(repeat[0]) not in sent}
+        return batch
+
+    def _dropped_notice(self) -> Optional[str]:
+        """A note about entries dropped since the last message, if any"""
+        if not self._dropped:
+            return None
+        dropped, self._dropped = self._dropped, 0
+        return f"⚠️ {dropped} log entries dropped while the channel was behind (see the local log)"
+
+    async def _send(self, embeds, content: str = None):
         try:
-            # Fetch the channel fresh each time to ensure we have permissions
-            channel = await self.bot.fetch_channel(self.log_channel_id)
+            channel = await self._get_channel()
             if not channel:
                 print(f"Channel {self.log_channel_id} not found")
                 return
-
-            formats = {
-                'info': ("📝 Info", 0x3498db),
-                'warning': ("⚠️ Warning", 0xf39c12),
-                'error': ("❌ Error", 0xe74c3c),
-                'debug': ("🐛 Debug", 0x9b59b6),
-                'critical': ("🚨 Critical", 0xe74c3c),
-                'startup': ("🟢 Online", 0x2ecc71),
-                'shutdown': ("🔴 Offline", 0xe74c3c),
-                'restart': ("🟡 Restarting", 0xf1c40f)
-            }
-            
-            header, color = formats.get(level.lower(), ("📌 Log", 0x7289da))
-            
-            if embed is None:
-                embed = Embed(
-                    title=header,
-                    description=f"```{message[:2000]}```",
-                    color=color
-                )
-            else:
-                embed.color = color
-                embed.title = f"{header} | {embed.title}" if embed.title else header
-            
-            embed.timestamp = discord.utils.utcnow()
             
             try:
-                if alert:
-                    await channel.send("@here", embed=embed)
-                else:
-                    await channel.send(embed=embed)
+                with perf.timed("discord:log_send"):
+                    await channel.send(content, embeds=embeds)
             except discord.Forbidden:
+                self._channel = None
                 print(f"Missing permissions to send messages in logging channel {self.log_channel_id}")
             except discord.HTTPException as e:
                 print(f"Failed to send log message: {e}")
                 
         except Exception as e:
+            self._channel = None
             print(f"Logging failed completely: {e}")
 
+    async def close(self):
+        """Stop batching and send everything still queued"""
+        # Never cancel the sender: a cancel landing during channel.send would
+        # lose the batch it already took off the queue. Wake it and let it
+        # drain the queue instead.
+        self._closed = True
+        self._closing.set()
+        self._queued.set()
+        if self._sender is not None:
+            try:
+                await self._sender
+            except Exception as e:
+                print(f"Log sender failed: {e}")
+            self._sender = None
+        
+        # Anything the sender left behind, e.g. if it had died
+        while self._carry is not None or (self._queue and not self._queue.empty()):
+            if self._carry is None:
+                self._carry = self._queue.get_nowait()
+            batch = self._next_batch()
+            await self._send(batch, content=self._dropped_notice())
+
     async def log_command_error(self, ctx, error):
         embed = Embed(
             title="Command Failed",
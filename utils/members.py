@@ -0,0 +1,111 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional
+import discord
+
+# Per-guild tables whose `active` flag follows guild membership; the
+# leaderboards and /position only rank active rows
+MEMBER_TABLES = ("user_xp", "sparkles")
+
+class MemberIndex:
+    """
+    Sorted member IDs per guild, stored as unsigned 64-bit integers.
+
+    An array('Q') costs 8 bytes per member, against well over 100 for a
+    set of string IDs, and a membership check is a binary search. Guilds
+    are loaded in full when the bot sees them (ready, join, available) and
+    then kept current one join or leave at a time by events/members.py,
+    which also keeps the `active` flag of each guild's rows in step.
+    A join or leave shifts the tail of the array, which is a single
+    memmove even for very large guilds.
+    """
+
+    def __init__(self):
+        self._guilds: Dict[int, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._guilds
+
+    def clear(self):
+        self._guilds.clear()
+
+    def load(self, guild_id: int, member_ids: Iterable[int]):
+        """Replace a guild's members"""
+        self._guilds[guild_id] = array("Q", sorted(member_ids))
+
+    def load_guild(self, guild: discord.Guild):
+        self.load(guild.id, (member.id for member in guild.members))
+
+    def drop(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    def add(self, guild_id: int, user_id: int):
+        ids = self._guilds.get(guild_id)
+        if ids is None:
+            return
+        index = bisect_left(ids, user_id)
+        if index == len(ids) or ids[index] != user_id:
+            ids.insert(index, user_id)
+
+    def remove(self, guild_id: int, user_id: int):
+        ids = self._guilds.get(guild_id)
+        if ids is None:
+            return
+        index = bisect_left(ids, user_id)
+        if index < len(ids) and ids[index] == user_id:
+            del ids[index]
+
+    def contains(self, guild_id: int, user_id: int) -> Optional[bool]:
+        """Whether the user is in the guild, or None if the guild isn't indexed"""
+        ids = self._guilds.get(guild_id)
+        if ids is None:
+            return None
+        index = bisect_left(ids, user_id)
+        return index < len(ids) and ids[index] == user_id
+
+    def size(self, guild_id: int) -> int:
+        ids = self._guilds.get(guild_id)
+        return len(ids) if ids is not None else 0
+
+    def memory_bytes(self) -> int:
+        return sum(ids.itemsize * len(ids) for ids in self._guilds.values())
+
+async def set_active(conn, server_id: str, user_id: str, active: bool) -> int:
+    """Flag a user's rows in a guild as (in)active; returns how many changed"""
+    changed = 0
+    async with conn.cursor() as cur:
+        for table in MEMBER_TABLES:
+            await cur.execute(
+                f"UPDATE {table} SET active = ? WHERE server_id = ? AND user_id = ? AND active != ?",
+                (int(active), server_id, user_id, int(active)))
+            changed += cur.get_cursor().rowcount
+    return changed
+
+async def sync_active(conn, index: MemberIndex, guild_id: int) -> int:
+    """
+    Set the `active` flag of a guild's rows from the index, e.g. for joins
+    and leaves missed while the bot was offline; returns how many changed
+    """
+    if guild_id not in index:
+        return 0  # not indexed: membership unknown, leave the flags alone
+    server_id = str(guild_id)
+    changed = 0
+    async with conn.cursor() as cur:
+        for table in MEMBER_TABLES:
+            await cur.execute(f"SELECT user_id, active FROM {table} WHERE server_id = ?", (server_id,))
+            updates = []
+            for user_id, active in await cur.fetchall():
+                member = index.contains(guild_id, int(user_id))
+                if member != bool(active):
+                    updates.append((int(member), server_id, user_id))
+            if updates:
+                await cur.executemany(
+                    f"UPDATE {table} SET active = ? WHERE server_id = ? AND user_id = ?", updates)
+                changed += len(updates)
+    return changed
+
+# Shared by the bot; kept across extension reloads
+member_index = MemberIndex()
\ No newline at end of file
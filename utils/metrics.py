@@ -0,0 +1,144 @@
+import asyncio
+import time
+from typing import Callable, Dict, Optional, Tuple
+from aiohttp import web
+from utils.perf import BUCKETS_MS, perf
+
+Labels = Tuple[Tuple[str, str], ...]
+
+PREFIX = "nova_"
+
+class Metrics:
+    """
+    In-process counters and gauges rendered in the Prometheus text format.
+
+    `inc` is a single dict update so it is safe to call on every message.
+    Gauges are either set directly or computed by a callback at scrape time.
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._gauge_callbacks: Dict[str, Callable[[], float]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str):
+        """Set the # TYPE and # HELP lines for a metric"""
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1, labels: Labels = ()):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, labels: Labels = ()):
+        self._gauges[(name, labels)] = value
+
+    def gauge_callback(self, name: str, callback: Callable[[], float]):
+        """Compute a gauge at scrape time; replaces any previous callback"""
+        self._gauge_callbacks[name] = callback
+
+    def counter(self, name: str, labels: Labels = ()) -> float:
+        return self._counters.get((name, labels), 0)
+
+    def render(self) -> str:
+        samples: Dict[str, list] = {}
+        for (name, labels), value in self._counters.items():
+            samples.setdefault(name, []).append((labels, value))
+        for (name, labels), value in self._gauges.items():
+            samples.setdefault(name, []).append((labels, value))
+        for name, callback in self._gauge_callbacks.items():
+            try:
+                value = callback()
+            except Exception:
+                continue  # a broken gauge shouldn't fail the whole scrape
+            samples.setdefault(name, []).append(((), value))
+        
+        lines = []
+        for name in sorted(samples):
+            kind, help_text = self._help.get(name, ("untyped", ""))
+            if help_text:
+                lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for labels, value in samples[name]:
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {float(value)}")
+        lines.extend(_render_latency())
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+def _render_latency():
+    """The since-startup /perf histograms as one Prometheus histogram family"""
+    name = f"{PREFIX}latency_seconds"
+    lines = [
+        f"# HELP {name} Time spent per listener, handler, command, DB access and send",
+        f"# TYPE {name} histogram",
+    ]
+    for metric, histogram in sorted(perf.snapshot().items()):
+        metric = _escape(metric)
+        cumulative = 0
+        for bound, count in zip(BUCKETS_MS, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{name="{metric}",le="{bound / 1000}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{name="{metric}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{name="{metric}"}} {histogram.total / 1000}')
+        lines.append(f'{name}_count{{name="{metric}"}} {histogram.count}')
+    return lines
+
+# Shared by the bot; cogs increment these directly
+metrics = Metrics()
+metrics.describe("messages_seen_total", "counter", "Messages received by the message pipeline")
+metrics.describe("xp_grants_total", "counter", "Messages that earned XP")
+metrics.describe("xp_cooldown_hits_total", "counter", "Messages skipped because the author was on XP cooldown")
+metrics.describe("sparkles_rolled_total", "counter", "Sparkle rolls")
+metrics.describe("sparkles_awarded_total", "counter", "Sparkles awarded, by type")
+metrics.describe("commands_total", "counter", "Commands finished, by command and outcome")
+metrics.describe("db_commits_total", "counter", "Write transactions committed")
+metrics.describe("event_loop_lag_seconds", "gauge", "How late the event loop ran a timer on the last check")
+metrics.describe("guilds", "gauge", "Guilds the bot is in")
+metrics.describe("xp_buffer_pending", "gauge", "Users with XP waiting to be flushed")
+
+class MetricsExporter:
+    """Serves `registry` on http://host:port/metrics and samples event-loop lag"""
+
+    def __init__(self, registry: Metrics, host: str = "127.0.0.1", port: int = 9108, lag_interval: float = 1.0):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.lag_interval = lag_interval
+        self._runner: Optional[web.AppRunner] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._lag_task = asyncio.create_task(self._sample_lag())
+
+    async def close(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.registry.render(),
+            content_type="text/plain",
+            charset="utf-8"
+        )
+
+    async def _sample_lag(self):
+        while True:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.registry.set_gauge("event_loop_lag_seconds", max(0.0, time.perf_counter() - expected))
\ No newline at end of file
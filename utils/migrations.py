@@ -0,0 +1,209 @@
+from typing import Awaitable, Callable, List, Tuple, Union
+from utils.ranks import NET_WORTH_OF
+
+# A migration is either a list of SQL statements or an async function
+# taking a cursor. Each one runs in its own transaction together with the
+# schema_version bump, so a failed migration leaves the version untouched.
+Migration = Union[List[str], Callable[[object], Awaitable[None]]]
+
+async def _base_schema(cur):
+    """Tables as they existed before versioned migrations"""
+    # First check if old blacklist table exists without created_at
+    await cur.execute("PRAGMA table_info(blacklist)")
+    columns = [col[1] for col in await cur.fetchall()]
+
+    # If table exists but is missing columns
+    if columns and 'created_at' not in columns:
+        # Create temporary backup
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS blacklist_backup AS
+            SELECT * FROM blacklist
+        """)
+        # Drop old table
+        await cur.execute("DROP TABLE IF EXISTS blacklist")
+
+    # Create all tables with current schema
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS sparkles (
+            server_id TEXT,
+            user_id TEXT,
+            epic INTEGER DEFAULT 0,
+            rare INTEGER DEFAULT 0,
+            regular INTEGER DEFAULT 0,
+            PRIMARY KEY (server_id, user_id)
+        )
+    """)
+
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_xp (
+            server_id TEXT,
+            user_id TEXT,
+            xp INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 1,
+            PRIMARY KEY (server_id, user_id)
+        )
+    """)
+
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_coins (
+            user_id TEXT PRIMARY KEY,
+            coins INTEGER DEFAULT 0
+        )
+    """)
+
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_ranks (
+            user_id TEXT,
+            rank_name TEXT,
+            rank_type TEXT,  -- 'level' or 'purchased'
+            is_equipped INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, rank_name, rank_type)
+        )
+    """)
+
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS shop_ranks (
+            rank_name TEXT PRIMARY KEY,
+            price INTEGER NOT NULL
+        )
+    """)
+
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS cooldowns (
+            user_id TEXT PRIMARY KEY,
+            last_message_time REAL
+        )
+    """)
+
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS guild_optouts (
+            server_id TEXT,
+            handler TEXT,  -- message pipeline handler name or 'all'
+            PRIMARY KEY (server_id, handler)
+        )
+    """)
+
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS blacklist (
+            user_id TEXT PRIMARY KEY,
+            reason TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def _net_worth_trigger(name: str, event: str, row: str) -> str:
+    """Recompute the stored net worth of the user a rank change affects"""
+    return f"""CREATE TRIGGER IF NOT EXISTS trg_net_worth_{name}
+           AFTER {event}
+           BEGIN
+               UPDATE user_xp SET net_worth = {NET_WORTH_OF.format(user=f"{row}.user_id")}
+               WHERE user_id = {row}.user_id;
+           END"""
+
+def _coins_trigger(name: str, event: str, delta: str) -> str:
+    """
+    Shift a user's stored net worth by a change in coins. Coins change on
+    every XP flush, so this adds the difference instead of recomputing.
+    """
+    return f"""CREATE TRIGGER IF NOT EXISTS trg_net_worth_{name}
+           AFTER {event}
+           BEGIN
+               UPDATE user_xp SET net_worth = net_worth + {delta}
+               WHERE user_id = {"OLD" if event.startswith("DELETE") else "NEW"}.user_id;
+           END"""
+
+# Numbered in the order they must be applied; never edit a released one,
+# append a new migration instead.
+MIGRATIONS: List[Tuple[int, str, Migration]] = [
+    (1, "base schema", _base_schema),
+    (2, "member flags and indexes for leaderboards and rank lookups", [
+        # Cleared while the user is out of the guild (events/members.py);
+        # the leaderboards and /position only rank active rows. The indexes
+        # below hold active rows only and end in `active` so they still
+        # cover queries that filter on it.
+        "ALTER TABLE user_xp ADD COLUMN active INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE sparkles ADD COLUMN active INTEGER NOT NULL DEFAULT 1",
+        # /xplb and position lookups: ORDER BY xp DESC within a server
+        """CREATE INDEX IF NOT EXISTS idx_user_xp_server_xp
+           ON user_xp (server_id, xp DESC, user_id, active) WHERE active = 1""",
+        # /sparklelb: ORDER BY epic + rare + regular DESC within a server
+        """CREATE INDEX IF NOT EXISTS idx_sparkles_total
+           ON sparkles (server_id, (epic + rare + regular) DESC, user_id, active) WHERE active = 1""",
+        # equipped rank lookups (/stats, /myranks, /unequiprank)
+        """CREATE INDEX IF NOT EXISTS idx_user_ranks_equipped
+           ON user_ranks (user_id, is_equipped)""",
+        # purchased rank lookups (net worth)
+        """CREATE INDEX IF NOT EXISTS idx_user_ranks_type
+           ON user_ranks (user_id, rank_type)""",
+    ]),
+    (3, "indexes for net worth positions", [
+        # /position: the few users whose purchased ranks add to their coins
+        """CREATE INDEX IF NOT EXISTS idx_user_ranks_purchased
+           ON user_ranks (user_id, rank_name) WHERE rank_type = 'purchased'""",
+    ]),
+    (4, "index for per-user XP lookups", [
+        # /backfill_ranks: MAX(xp) per user, walked in user_id order
+        """CREATE INDEX IF NOT EXISTS idx_user_xp_user
+           ON user_xp (user_id, xp)""",
+    ]),
+    (5, "per-guild net worth kept on user_xp", [
+        "ALTER TABLE user_xp ADD COLUMN net_worth INTEGER NOT NULL DEFAULT 0",
+        "UPDATE user_xp SET net_worth = " + NET_WORTH_OF.format(user="user_xp.user_id"),
+        # /networthlb and /position: ORDER BY net_worth DESC within a server
+        """CREATE INDEX IF NOT EXISTS idx_user_xp_server_net_worth
+           ON user_xp (server_id, net_worth DESC, user_id, active) WHERE active = 1""",
+        # Keep a user's net worth current wherever its inputs change: a new
+        # row and rank changes recompute it, coin changes add the difference.
+        # Shop price changes are applied by init_db's catalog sync instead.
+        """CREATE TRIGGER IF NOT EXISTS trg_net_worth_user_xp
+           AFTER INSERT ON user_xp
+           BEGIN
+               UPDATE user_xp SET net_worth = """ + NET_WORTH_OF.format(user="NEW.user_id") + """
+               WHERE server_id = NEW.server_id AND user_id = NEW.user_id;
+           END""",
+        _coins_trigger("coins_insert", "INSERT ON user_coins", "COALESCE(NEW.coins, 0)"),
+        _coins_trigger(
+            "coins_update", "UPDATE OF coins ON user_coins WHEN NEW.coins IS NOT OLD.coins",
+            "COALESCE(NEW.coins, 0) - COALESCE(OLD.coins, 0)"),
+        _coins_trigger("coins_delete", "DELETE ON user_coins", "-COALESCE(OLD.coins, 0)"),
+        _net_worth_trigger("ranks_insert", "INSERT ON user_ranks WHEN NEW.rank_type = 'purchased'", "NEW"),
+        _net_worth_trigger("ranks_update", "UPDATE OF rank_name, rank_type ON user_ranks", "NEW"),
+        _net_worth_trigger("ranks_delete", "DELETE ON user_ranks WHEN OLD.rank_type = 'purchased'", "OLD"),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+async def get_schema_version(conn) -> int:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+        await cur.execute("SELECT MAX(version) FROM schema_version")
+        row = await cur.fetchone()
+        return row[0] or 0
+
+async def migrate(conn) -> List[int]:
+    """
+    Apply every migration newer than the stored schema version
+    Returns: versions applied (empty when the schema is current)
+    """
+    current = await get_schema_version(conn)
+    applied = []
+
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+
+        async with conn.transaction():
+            async with conn.cursor() as cur:
+                if callable(migration):
+                    await migration(cur)
+                else:
+                    for statement in migration:
+                        await cur.execute(statement)
+                await cur.execute("DELETE FROM schema_version")
+                await cur.execute(
+                    "INSERT INTO schema_version (version) VALUES (?)", (version,))
+        applied.append(version)
+
+    return applied
@@ -0,0 +1,227 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import discord
+from config import leaderboard_window_ttl, leaderboard_window_guilds, leaderboard_window_rows
+from utils.database import read
+
+# (user_id, score, *extra columns), best first
+Row = tuple
+Cursor = Optional[Tuple[int, str]]  # (score, user_id) of the last row read
+# fetch(conn, server_id, after, limit) -> active rows strictly after `after`
+Fetch = Callable[[object, str, Cursor, int], Awaitable[List[Row]]]
+PageRenderer = Callable[[List[Row], int, int], discord.Embed]
+
+# Appended to a "score DESC, user_id" query to seek past the cursor. The
+# leading `<=` is what lets SQLite seek the (server_id, score DESC, user_id)
+# indexes instead of scanning from the top.
+KEYSET_AFTER = "({score} <= ? AND ({score} < ? OR user_id > ?))"
+
+def keyset_params(after: Cursor) -> tuple:
+    score, user_id = after
+    return (score, score, user_id)
+
+def row_cursor(row: Row) -> Cursor:
+    """The keyset cursor that seeks past `row`"""
+    return (row[1], row[0])
+
+class _Window:
+    __slots__ = ("start", "rows", "positions", "cursor", "exhausted", "loaded_at", "lock")
+
+    def __init__(self, start: Cursor):
+        self.start = start  # cursor just before rows[0]; None is the top of the board
+        self.rows: List[Row] = []
+        self.positions: Dict[Tuple[int, str], int] = {}  # row cursor -> index in rows
+        self.cursor = start  # last row read from the database
+        self.exhausted = False
+        self.loaded_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def index_after(self, after: Cursor) -> Optional[int]:
+        """Index of the first row after `after`, or None if it isn't in this window"""
+        if after == self.start:
+            return 0
+        position = self.positions.get(after)
+        return None if position is None else position + 1
+
+class LeaderboardPages:
+    """
+    Keyset-paginated leaderboard with one cached result window per guild.
+
+    A page is addressed by the cursor of the row before it, so it is read
+    by seeking past that row (never OFFSET) and a deep page costs the same
+    as the first. The window caches a run of consecutive rows; pages that
+    fall inside it, or just past its end, are served from it and extend it.
+    A page anywhere else, or one that would grow the window past
+    `max_rows`, starts a new window at that page's cursor, as does an
+    expired one (after `ttl` seconds). The fetch queries only return active
+    rows, so users who left the guild are never listed, and the least
+    recently used guilds are dropped past `max_guilds`.
+    """
+
+    def __init__(
+        self,
+        fetch: Fetch,
+        chunk_size: int = 50,
+        ttl: float = leaderboard_window_ttl,
+        max_guilds: int = leaderboard_window_guilds,
+        max_rows: int = leaderboard_window_rows,
+    ):
+        self.fetch = fetch
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.max_guilds = max_guilds
+        self.max_rows = max_rows
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+
+    def invalidate(self, server_id: str):
+        self._windows.pop(server_id, None)
+
+    def clear(self):
+        self._windows.clear()
+
+    def _window(self, server_id: str, after: Cursor, page_size: int) -> Tuple[_Window, int]:
+        window = self._windows.get(server_id)
+        index = None
+        if window is not None and time.monotonic() - window.loaded_at <= self.ttl:
+            index = window.index_after(after)
+        if index is not None:
+            wanted = index + page_size + 1
+            if wanted > len(window.rows) and wanted > self.max_rows and not window.exhausted:
+                index = None  # full; start over at this page instead of growing it
+        if index is None:
+            window = self._windows[server_id] = _Window(after)
+            index = 0
+        self._windows.move_to_end(server_id)
+        while len(self._windows) > self.max_guilds:
+            self._windows.popitem(last=False)
+        return window, index
+
+    async def _extend(self, window: _Window, guild: discord.Guild, wanted: int):
+        async with window.lock:
+            while len(window.rows) < wanted and not window.exhausted:
+                async with read() as conn:
+                    batch = await self.fetch(conn, str(guild.id), window.cursor, self.chunk_size)
+                if len(batch) < self.chunk_size:
+                    window.exhausted = True
+                if batch:
+                    window.cursor = row_cursor(batch[-1])
+                for row in batch:
+                    window.positions[row_cursor(row)] = len(window.rows)
+                    window.rows.append(row)
+
+    async def page(self, guild: discord.Guild, after: Cursor, page_size: int) -> Tuple[List[Row], bool]:
+        """
+        Up to `page_size` rows after the cursor
+        Returns: (rows, whether a later page exists)
+        """
+        window, index = self._window(str(guild.id), after, page_size)
+        # One extra row tells us if there is a next page
+        await self._extend(window, guild, index + page_size + 1)
+        return window.rows[index:index + page_size], len(window.rows) > index + page_size
+
+class LeaderboardView(discord.ui.View):
+    """Previous/next buttons over a LeaderboardPages for the invoking user"""
+
+    def __init__(
+        self,
+        pages: LeaderboardPages,
+        guild: discord.Guild,
+        author_id: int,
+        render: PageRenderer,
+        page_size: int,
+        timeout: float = 120,
+    ):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.guild = guild
+        self.author_id = author_id
+        self.render = render
+        self.page_size = page_size
+        self.page = 0
+        # cursors[n] seeks to page n; filled in as pages are shown
+        self.cursors: List[Cursor] = [None]
+        self.message: Optional[discord.Message] = None
+
+    async def current_embed(self) -> Optional[discord.Embed]:
+        """Render the current page and update the buttons; None if it's empty"""
+        rows, has_next = await self.pages.page(self.guild, self.cursors[self.page], self.page_size)
+        if not rows:
+            return None
+        # Scores move, so the next page always starts after what is shown now
+        del self.cursors[self.page + 1:]
+        if has_next:
+            self.cursors.append(row_cursor(rows[-1]))
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = not has_next
+        return self.render(rows, self.page * self.page_size + 1, self.page + 1)
+
+    async def open_page(self, page: int) -> Optional[discord.Embed]:
+        """Walk from the top to a 0-based page (or the last one), recording each page's cursor"""
+        self.page = 0
+        embed = await self.current_embed()
+        while embed is not None and self.page < page and len(self.cursors) > self.page + 1:
+            self.page += 1
+            embed = await self.current_embed()
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message(
+                "Run the command yourself to browse the leaderboard!", ephemeral=True)
+            return False
+        return True
+
+    async def _turn(self, interaction: discord.Interaction, step: int):
+        previous = self.page
+        self.page = min(max(0, self.page + step), len(self.cursors) - 1)
+        embed = await self.current_embed()
+        if embed is None:
+            # The board shrank since this page was shown
+            self.page = previous if previous < self.page else 0
+            embed = await self.current_embed()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._turn(interaction, -1)
+
+    @discord.ui.button(label="Next", emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._turn(interaction, 1)
+
+    async def on_timeout(self):
+        if self.message is None:
+            return
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException:
+            pass
+
+async def send_leaderboard(
+    ctx,
+    pages: LeaderboardPages,
+    render: PageRenderer,
+    page_size: int,
+    page: int,
+    empty_message: str,
+):
+    """
+    Send page `page` (1-based) of a leaderboard with navigation buttons.
+    Reaching a page directly means reading every page before it, so only
+    pages within one window can be opened this way; the buttons go further.
+    """
+    max_page = max(1, pages.max_rows // page_size)
+    if page > max_page:
+        return await ctx.send(
+            f"You can open pages 1-{max_page} directly; use the Next button to go further.",
+            ephemeral=True)
+    
+    view = LeaderboardView(pages, ctx.guild, ctx.author.id, render, page_size)
+    embed = await view.open_page(max(0, page - 1))
+    if embed is None:
+        return await ctx.send(empty_message, ephemeral=True)
+    view.message = await ctx.send(embed=embed, view=view)
\ No newline at end of file
@@ -0,0 +1,120 @@
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in milliseconds; anything slower lands in the overflow bucket.
+# The sub-millisecond buckets resolve message handlers, which rarely await.
+BUCKETS_MS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    """Fixed-bucket latency histogram; constant memory however many samples"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def merge(self, other: "Histogram"):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction, capped at the max seen"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                bound = BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+class PerfRegistry:
+    """
+    Named histograms kept since startup plus a sliding window made of
+    `slice_seconds` slices, of which the newest `slices` are retained.
+    """
+
+    def __init__(self, slice_seconds: float = 60.0, slices: int = 60):
+        self.slice_seconds = slice_seconds
+        self.started_at = time.time()
+        self.totals: Dict[str, Histogram] = {}
+        # (slice start, name -> histogram), oldest first
+        self._slices: "deque[Tuple[float, Dict[str, Histogram]]]" = deque(maxlen=slices)
+
+    def observe(self, name: str, seconds: float):
+        ms = seconds * 1000
+        histogram = self.totals.get(name)
+        if histogram is None:
+            histogram = self.totals[name] = Histogram()
+        histogram.observe(ms)
+        
+        current = self._current_slice()
+        histogram = current.get(name)
+        if histogram is None:
+            histogram = current[name] = Histogram()
+        histogram.observe(ms)
+
+    def _current_slice(self) -> Dict[str, Histogram]:
+        now = time.time()
+        start = now - now % self.slice_seconds
+        if not self._slices or self._slices[-1][0] != start:
+            self._slices.append((start, {}))
+        return self._slices[-1][1]
+
+    @contextmanager
+    def timed(self, name: str):
+        """Record how long the block takes, including time spent awaiting"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self, window: Optional[float] = None) -> Dict[str, Histogram]:
+        """Histograms since startup, or merged over the last `window` seconds"""
+        if window is None:
+            return dict(self.totals)
+        
+        cutoff = time.time() - window
+        merged: Dict[str, Histogram] = {}
+        for start, histograms in self._slices:
+            if start + self.slice_seconds <= cutoff:
+                continue
+            for name, histogram in histograms.items():
+                merged.setdefault(name, Histogram()).merge(histogram)
+        return merged
+
+    def top(self, window: Optional[float] = None, limit: int = 10, prefix: str = "") -> List[Tuple[str, Histogram]]:
+        """Metrics that spent the most total time, worst first"""
+        rows = [
+            (name, histogram) for name, histogram in self.snapshot(window).items()
+            if name.startswith(prefix)
+        ]
+        rows.sort(key=lambda row: row[1].total, reverse=True)
+        return rows[:limit]
+
+    def clear(self):
+        self.started_at = time.time()
+        self.totals.clear()
+        self._slices.clear()
+
+# Shared by the bot; names are "<kind>:<what>", e.g. "command:stats"
+perf = PerfRegistry()
\ No newline at end of file
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Set, Tuple
+from utils.metrics import metrics
+from utils.perf import perf
+
+MessageHandler = Callable[[object], Awaitable[object]]
+
+# Opting a guild out of this name disables every handler there
+ALL_HANDLERS = "all"
+
+class MessagePipeline:
+    """
+    Single on_message stage shared by every message listener.
+
+    The filters every listener needs (bot authors, DMs, blacklisted users,
+    per-guild opt-outs) run once per message, then the registered handlers
+    are started in a fixed order and run concurrently. A handler that
+    raises is logged without affecting the others.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._handlers: List[Tuple[int, str, MessageHandler]] = []
+        self._guild_optouts: Dict[int, Set[str]] = {}
+        # name -> [calls, total seconds, max seconds, failures]
+        self.timings: Dict[str, List[float]] = {}
+
+    @property
+    def handler_names(self) -> List[str]:
+        return [name for _, name, _ in self._handlers]
+
+    def register(self, name: str, handler: MessageHandler, order: int = 100):
+        """Add a handler; lower `order` starts first. Re-registering replaces it"""
+        self.unregister(name)
+        self._handlers.append((order, name, handler))
+        self._handlers.sort(key=lambda entry: entry[0])
+        self.timings.setdefault(name, [0, 0.0, 0.0, 0])
+
+    def unregister(self, name: str):
+        self._handlers = [entry for entry in self._handlers if entry[1] != name]
+
+    def opt_out(self, guild_id: int, name: str):
+        self._guild_optouts.setdefault(guild_id, set()).add(name)
+
+    def opt_in(self, guild_id: int, name: str):
+        optouts = self._guild_optouts.get(guild_id)
+        if optouts:
+            optouts.discard(name)
+            if not optouts:
+                del self._guild_optouts[guild_id]
+
+    def guild_optouts(self, guild_id: int) -> Set[str]:
+        return set(self._guild_optouts.get(guild_id, ()))
+
+    async def load_optouts(self, conn):
+        """Load per-guild opt-outs from the guild_optouts table"""
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT server_id, handler FROM guild_optouts")
+            for server_id, handler in await cur.fetchall():
+                self.opt_out(int(server_id), handler)
+
+    async def dispatch(self, message):
+        metrics.inc("messages_seen_total")
+        if message.author.bot or not message.guild:
+            return
+        if message.author.id in self.bot._blacklisted_users:
+            return
+
+        optouts = self._guild_optouts.get(message.guild.id)
+        if optouts:
+            if ALL_HANDLERS in optouts:
+                return
+            handlers = [entry for entry in self._handlers if entry[1] not in optouts]
+        else:
+            handlers = self._handlers
+
+        if handlers:
+            await asyncio.gather(*(self._run(name, handler, message) for _, name, handler in handlers))
+
+    async def _run(self, name: str, handler: MessageHandler, message):
+        start = time.perf_counter()
+        failed = False
+        try:
+            await handler(message)
+        except Exception as e:
+            failed = True
+            await self.bot.logger.log(
+                f"Message handler '{name}' failed: {type(e).__name__}: {str(e)}",
+                level="error")
+        finally:
+            elapsed = time.perf_counter() - start
+            perf.observe(f"handler:{name}", elapsed)
+            stats = self.timings.setdefault(name, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += failed
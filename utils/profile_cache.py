@@ -0,0 +1,107 @@
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+from config import profile_cache_size, profile_cache_ttl
+from utils.database import read
+
+class UserProfile(NamedTuple):
+    xp: int
+    coins: int
+    ranks: Tuple[Tuple[str, bool, str], ...]  # (rank_name, is_equipped, rank_type), level ranks first
+    equipped_rank: Optional[str]
+
+# One round trip: the driving row keeps users with no data at all
+PROFILE_SELECT = """
+    SELECT ux.xp, uc.coins, ur.rank_name, ur.is_equipped, ur.rank_type
+    FROM (SELECT ? AS user_id) u
+    LEFT JOIN user_xp ux ON ux.server_id = ? AND ux.user_id = u.user_id
+    LEFT JOIN user_coins uc ON uc.user_id = u.user_id
+    LEFT JOIN user_ranks ur ON ur.user_id = u.user_id
+    ORDER BY CASE ur.rank_type WHEN 'level' THEN 0 ELSE 1 END, ur.rank_name
+"""
+
+class ProfileCache:
+    """
+    Per-(guild, user) XP, coins and ranks for /stats and /myranks.
+
+    Entries expire after `ttl` seconds and the least recently used are
+    evicted past `max_entries`. Code that writes any of these fields calls
+    `invalidate_user` after committing. Coins and ranks are global, so that
+    drops the user's entries in every guild. A load that overlaps an
+    invalidation is returned but not cached, so it can't pin stale data.
+    """
+
+    def __init__(self, max_entries: int = 5000, ttl: float = 120.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, UserProfile]]" = OrderedDict()
+        self._guilds_by_user: Dict[str, Set[str]] = {}
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._guilds_by_user.clear()
+        self._generation += 1
+
+    def invalidate_user(self, user_id: str):
+        self._generation += 1
+        for server_id in self._guilds_by_user.pop(user_id, ()):
+            self._entries.pop((server_id, user_id), None)
+
+    def _forget(self, server_id: str, user_id: str):
+        guilds = self._guilds_by_user.get(user_id)
+        if guilds is not None:
+            guilds.discard(server_id)
+            if not guilds:
+                del self._guilds_by_user[user_id]
+
+    def get_cached(self, server_id: str, user_id: str) -> Optional[UserProfile]:
+        key = (server_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl:
+            del self._entries[key]
+            self._forget(server_id, user_id)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, server_id: str, user_id: str, profile: UserProfile):
+        self._entries[(server_id, user_id)] = (time.monotonic(), profile)
+        self._entries.move_to_end((server_id, user_id))
+        self._guilds_by_user.setdefault(user_id, set()).add(server_id)
+        while len(self._entries) > self.max_entries:
+            (old_server, old_user), _ = self._entries.popitem(last=False)
+            self._forget(old_server, old_user)
+
+    async def get(self, server_id: str, user_id: str) -> UserProfile:
+        """A user's profile in a guild, from the cache or a single query"""
+        profile = self.get_cached(server_id, user_id)
+        if profile is not None:
+            return profile
+
+        generation = self._generation
+        async with read() as conn:
+            rows = await conn.fetchall(PROFILE_SELECT, (user_id, server_id))
+
+        first = rows[0]
+        ranks = tuple(
+            (rank_name, bool(is_equipped), rank_type)
+            for _, _, rank_name, is_equipped, rank_type in rows
+            if rank_name is not None
+        )
+        profile = UserProfile(
+            xp=first[0] or 0,
+            coins=first[1] or 0,
+            ranks=ranks,
+            equipped_rank=next((name for name, equipped, _ in ranks if equipped), None)
+        )
+        if generation == self._generation:
+            self._store(server_id, user_id, profile)
+        return profile
+
+profile_cache = ProfileCache(profile_cache_size, profile_cache_ttl)
\ No newline at end of file
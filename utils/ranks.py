@@ -0,0 +1,86 @@
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Purchasable ranks and their prices. This is the single source of truth:
+# init_db mirrors it into the shop_ranks table so SQL can price ranks too.
+SHOP_RANKS = {
+    "cutie": 1000,
+    "goddess": 10000,
+    "uwu": 3000,
+    "smol": 2000,
+    "bean": 4000,
+    "divine": 15000,
+    "legendary": 20000,
+    "potato": 1000,
+    "angel": 5000,
+    "bunny": 3500,
+    "princess": 8000
+}
+
+# A user's coins + the price of every purchased rank, priced through the
+# shop_ranks catalog; `{user}` is the SQL expression for the user_id. The
+# result is kept on each of the user's user_xp rows as net_worth.
+NET_WORTH_OF = """(
+    COALESCE((SELECT coins FROM user_coins WHERE user_id = {user}), 0)
+    + COALESCE((SELECT SUM(sr.price) FROM user_ranks ur
+                JOIN shop_ranks sr ON sr.rank_name = LOWER(ur.rank_name)
+                WHERE ur.user_id = {user} AND ur.rank_type = 'purchased'), 0)
+)"""
+
+# Level-based ranks, keyed by the level that unlocks them
+LEVEL_RANKS = {
+    0: "Nova Seed",
+    5: "Blossoming Nova",
+    10: "Starlight Sprite",
+    15: "Celestial Bloom",
+    20: "Luminous Petal",
+    25: "Galactic Lily",
+    30: "Cosmic Rose",
+    35: "Nebula Orchid",
+    40: "Supernova Dahlia",
+    45: "Quasar Peony",
+    50: "Pulsar Primrose",
+    55: "Andromeda Azalea",
+    60: "Infinity Iris",
+    65: "Eternal Violet",
+    70: "Paradise Magnolia",
+    75: "Dreamweaver Lotus",
+    80: "Mystic Marigold",
+    85: "Enchanted Tulip",
+    90: "Divine Daffodil",
+    95: "Transcendent Camellia",
+    100: "Ultimate Nova"
+}
+
+# Parallel arrays sorted by unlock level, built once for bisect lookups
+_RANK_LEVELS = tuple(sorted(LEVEL_RANKS))
+_RANK_NAMES = tuple(LEVEL_RANKS[level] for level in _RANK_LEVELS)
+
+@lru_cache(maxsize=256)
+def achieved_level_ranks(level: int) -> Tuple[str, ...]:
+    """Every level rank unlocked at `level`, lowest first"""
+    return _RANK_NAMES[:bisect_right(_RANK_LEVELS, level)]
+
+@lru_cache(maxsize=256)
+def current_level_rank(level: int) -> Optional[str]:
+    """Highest level rank unlocked at `level`"""
+    index = bisect_right(_RANK_LEVELS, level)
+    return _RANK_NAMES[index - 1] if index else None
+
+@lru_cache(maxsize=256)
+def next_level_rank(level: int) -> Optional[Tuple[int, str]]:
+    """(unlock level, name) of the next rank above `level`, None past the last one"""
+    index = bisect_right(_RANK_LEVELS, level)
+    if index == len(_RANK_LEVELS):
+        return None
+    return _RANK_LEVELS[index], _RANK_NAMES[index]
+
+@lru_cache(maxsize=1024)
+def level_ranks_between(old_level: int, new_level: int) -> Tuple[str, ...]:
+    """
+    Ranks unlocked by going from old_level to new_level. Leaving level 0
+    also grants the level 0 rank.
+    """
+    start = bisect_right(_RANK_LEVELS, old_level) if old_level > 0 else 0
+    return _RANK_NAMES[start:bisect_right(_RANK_LEVELS, new_level)]
\ No newline at end of file
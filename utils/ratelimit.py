@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+class TokenBucketLimiter:
+    """
+    In-process token bucket rate limiter keyed by string.
+
+    Each key refills `rate` tokens per second up to `capacity` and a hit
+    costs one token. A bucket that has sat idle long enough to refill
+    completely behaves exactly like a brand new one, so such keys are
+    expired as they age out; `max_keys` caps memory on top of that.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, max_keys: int = 100_000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._refill_time = capacity / rate
+        # key -> (tokens, updated_at), oldest update first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def hit(self, key: str, now: Optional[float] = None) -> bool:
+        """Consume a token for `key`. Returns False if the key is rate limited"""
+        now = time.time() if now is None else now
+        self._expire(now)
+
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            tokens, updated_at = bucket
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed
+
+    def forget(self, key: str):
+        """Drop a key's bucket so its next hit is allowed"""
+        self._buckets.pop(key, None)
+
+    def _expire(self, now: float):
+        cutoff = now - self._refill_time
+        while self._buckets:
+            tokens, updated_at = next(iter(self._buckets.values()))
+            if updated_at > cutoff:
+                break
+            self._buckets.popitem(last=False)
+
+    def snapshot(self, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Export buckets that are still limited as (key, timestamp) pairs,
+        where timestamp is when the bucket was last empty. With a capacity
+        of 1 this is simply the time of the last allowed hit.
+        """
+        now = time.time() if now is None else now
+        self._expire(now)
+        rows = []
+        for key, (tokens, updated_at) in self._buckets.items():
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+            if tokens < self.capacity:
+                rows.append((key, now - tokens / self.rate))
+        return rows
+
+    def restore(self, rows: List[Tuple[str, float]], now: Optional[float] = None):
+        """Load (key, timestamp) pairs produced by `snapshot`"""
+        now = time.time() if now is None else now
+        for key, timestamp in sorted(rows, key=lambda row: row[1]):
+            tokens = (now - timestamp) * self.rate
+            if tokens < self.capacity:
+                self._buckets[key] = (max(0.0, tokens), now)
+
+async def load_cooldowns(conn, limiter: TokenBucketLimiter):
+    """Restore limiter state saved by `save_cooldowns`"""
+    cutoff = time.time() - limiter.capacity / limiter.rate
+    async with conn.cursor() as cur:
+        await cur.execute(
+            "SELECT user_id, last_message_time FROM cooldowns WHERE last_message_time > ?",
+            (cutoff,))
+        limiter.restore([(row[0], row[1]) for row in await cur.fetchall()])
+
+async def save_cooldowns(conn, limiter: TokenBucketLimiter):
+    """Persist the buckets that are still limited into the cooldowns table (caller commits)"""
+    async with conn.cursor() as cur:
+        await cur.execute("DELETE FROM cooldowns")
+        await cur.executemany(
+            "INSERT INTO cooldowns (user_id, last_message_time) VALUES (?, ?)",
+            limiter.snapshot())
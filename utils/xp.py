@@ -1,5 +1,7 @@
 import random
-from typing import Tuple
+import sqlite3
+from bisect import bisect_right
+from typing import Iterable, List, Tuple
 
 # Configuration
 XP_PER_MESSAGE = (5, 15)  # min, max XP per message
@@ -7,41 +9,63 @@ BASE_XP_NEEDED = 100
 XP_MULTIPLIER = 1.2
 LEVEL_UP_BONUS = 100
 
+# UPSERT ... RETURNING needs SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Cumulative XP needed to reach each level: _thresholds[n] == xp_for_level(n).
+# Built lazily and extended on demand; per-level requirements are truncated
+# with int() at every step, exactly like the original level-by-level loop.
+_thresholds: List[int] = [0]
+_next_requirement = BASE_XP_NEEDED
+
+def _extend_thresholds(xp: int):
+    """Grow the threshold table until it covers `xp`"""
+    global _next_requirement
+    while _thresholds[-1] <= xp:
+        _thresholds.append(_thresholds[-1] + _next_requirement)
+        _next_requirement = int(_next_requirement * XP_MULTIPLIER)
+
 def calculate_level(xp: int) -> Tuple[int, int]:
     """
     Calculate current level and XP progress to next level
     Returns: (current_level, xp_into_current_level)
     """
-    level = 0
-    xp_needed = BASE_XP_NEEDED
-    while xp >= xp_needed:
-        xp -= xp_needed
-        level += 1
-        xp_needed = int(xp_needed * XP_MULTIPLIER)
-    return level, xp
+    if xp < BASE_XP_NEEDED:
+        return 0, xp
+    if _thresholds[-1] <= xp:
+        _extend_thresholds(xp)
+    level = bisect_right(_thresholds, xp) - 1
+    return level, xp - _thresholds[level]
+
+def calculate_levels(xps: Iterable[int]) -> List[int]:
+    """Convert many XP totals to levels at once (e.g. a leaderboard page)"""
+    xps = list(xps)
+    if xps:
+        _extend_thresholds(max(xps))
+    return [bisect_right(_thresholds, xp) - 1 if xp > 0 else 0 for xp in xps]
 
 def xp_for_next_level(level: int) -> int:
     """
-    Calculate total XP needed to reach the next level
+    Calculate XP needed to get from `level` to the next level
     Example: xp_for_next_level(0) -> 100 (base)
              xp_for_next_level(1) -> 120 (100 * 1.2)
              xp_for_next_level(2) -> 144 (120 * 1.2)
+    Read from the threshold table so it always agrees with calculate_level.
     """
     if level < 0:
         return BASE_XP_NEEDED
-    return int(BASE_XP_NEEDED * (XP_MULTIPLIER ** level))
+    return xp_for_level(level + 1) - xp_for_level(level)
 
 def xp_for_level(level: int) -> int:
     """
     Calculate total XP needed to reach a specific level
     (Sum of XP needed for all previous levels)
     """
-    total = 0
-    current_requirement = BASE_XP_NEEDED
-    for _ in range(level):
-        total += current_requirement
-        current_requirement = int(current_requirement * XP_MULTIPLIER)
-    return total
+    if level <= 0:
+        return 0
+    while len(_thresholds) <= level:
+        _extend_thresholds(_thresholds[-1])
+    return _thresholds[level]
 
 def calculate_level_progress(xp: int) -> Tuple[int, int, int]:
     """
@@ -53,47 +77,49 @@ def calculate_level_progress(xp: int) -> Tuple[int, int, int]:
     progress = min(100, int((xp_into_level / next_level_xp) * 100)) if next_level_xp > 0 else 100
     return level, progress, next_level_xp
 
-async def add_xp(conn, user_id: str, server_id: str) -> Tuple[int, bool]:
+def roll_xp() -> int:
+    """Roll the XP granted for a single message"""
+    return random.randint(*XP_PER_MESSAGE)
+
+async def apply_xp(cur, user_id: str, server_id: str, xp_gain: int, coin_gain: int) -> Tuple[int, int]:
     """
-    Add XP to user and check for level up
-    Returns: (new_total_xp, leveled_up)
+    Credit XP and coins (plus any level up bonus) without committing. The
+    row is marked active too: only members can send messages.
+    Returns: (old_total_xp, new_total_xp)
     """
-    xp_gain = random.randint(*XP_PER_MESSAGE)
-    
-    async with conn.cursor() as cur:
-        # Get current XP
+    if _HAS_RETURNING:
+        # One statement both applies the grant and reports the new total,
+        # so old/new can't be skewed by a concurrent grant in between
+        await cur.execute(
+            """INSERT INTO user_xp (server_id, user_id, xp)
+            VALUES (?, ?, ?)
+            ON CONFLICT(server_id, user_id) DO UPDATE SET
+            xp = xp + excluded.xp, active = 1
+            RETURNING xp""",
+            (server_id, user_id, xp_gain))
+        new_xp = (await cur.fetchone())[0]
+        old_xp = new_xp - xp_gain
+    else:
         await cur.execute(
             "SELECT xp FROM user_xp WHERE server_id = ? AND user_id = ?",
             (server_id, user_id))
         row = await cur.fetchone()
-        
         old_xp = row[0] if row else 0
         new_xp = old_xp + xp_gain
-        old_level = calculate_level(old_xp)[0]
-        new_level = calculate_level(new_xp)[0]
-        
-        # Update XP
         await cur.execute(
             """INSERT INTO user_xp (server_id, user_id, xp)
             VALUES (?, ?, ?)
             ON CONFLICT(server_id, user_id) DO UPDATE SET
-            xp = xp + excluded.xp""",
+            xp = xp + excluded.xp, active = 1""",
             (server_id, user_id, xp_gain))
-        
-        # Update coins
-        await cur.execute(
-            """INSERT INTO user_coins (user_id, coins)
-            VALUES (?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-            coins = coins + excluded.coins""",
-            (user_id, xp_gain))
-        
-        # Level up bonus
-        if new_level > old_level:
-            bonus = LEVEL_UP_BONUS * (new_level - old_level)
-            await cur.execute(
-                "UPDATE user_coins SET coins = coins + ? WHERE user_id = ?",
-                (bonus, user_id))
-        
-        await conn.commit()
-        return (new_xp, new_level > old_level)
\ No newline at end of file
+    
+    # Coins for the message plus the level up bonus in a single upsert
+    levels_gained = calculate_level(new_xp)[0] - calculate_level(old_xp)[0]
+    await cur.execute(
+        """INSERT INTO user_coins (user_id, coins)
+        VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+        coins = coins + excluded.coins""",
+        (user_id, coin_gain + LEVEL_UP_BONUS * max(0, levels_gained)))
+    
+    return old_xp, new_xp
\ No newline at end of file
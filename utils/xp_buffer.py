@@ -0,0 +1,140 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Tuple
+from utils.database import write
+from utils.leaderboard import xp_leaderboard
+from utils.profile_cache import profile_cache
+from utils.xp import apply_xp, calculate_level
+
+# (conn, server_id, user_id, old_level, new_level)
+LevelUpListener = Callable[[object, str, str, int, int], Awaitable[None]]
+
+class XPBuffer:
+    """
+    Write-behind accumulator for message XP and coins.
+
+    Grants are merged per (server_id, user_id) in memory and written in a
+    single transaction every `flush_interval` seconds, or as soon as
+    `max_entries` distinct users are pending. Level ups are detected at
+    flush time and handed to the registered listeners inside the same
+    transaction, so rewards are committed together with the XP that
+    earned them.
+    """
+
+    def __init__(self, logger=None, flush_interval: float = 1.0, max_entries: int = 500):
+        self.logger = logger
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self._pending: Dict[Tuple[str, str], List[int]] = {}
+        self._listeners: List[LevelUpListener] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, server_id: str, user_id: str, xp: int, coins: int = None):
+        """Queue an XP (and coin) grant, merging it with any pending one"""
+        entry = self._pending.get((server_id, user_id))
+        if entry is None:
+            self._pending[(server_id, user_id)] = [xp, xp if coins is None else coins]
+            if len(self._pending) >= self.max_entries:
+                self._wakeup.set()
+        else:
+            entry[0] += xp
+            entry[1] += xp if coins is None else coins
+
+    def add_level_up_listener(self, listener: LevelUpListener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_level_up_listener(self, listener: LevelUpListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def start(self):
+        """Start the background flush loop"""
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the flush loop and write out everything still pending"""
+        # Never cancel the loop: a cancel landing while COMMIT runs on the
+        # connection's thread can still commit, and the batch would then be
+        # put back and written twice. Wake it and let it finish instead.
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                await self._log(f"XP flush failed: {type(e).__name__}: {str(e)}")
+
+    async def flush(self) -> int:
+        """
+        Write all pending grants in one transaction
+        Returns: number of (server, user) entries written
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            
+            batch, self._pending = self._pending, {}
+            try:
+                async with write() as conn:
+                    level_ups = []
+                    totals = []
+                    async with conn.cursor() as cur:
+                        for (server_id, user_id), (xp, coins) in batch.items():
+                            old_xp, new_xp = await apply_xp(cur, user_id, server_id, xp, coins)
+                            totals.append((server_id, user_id, new_xp))
+                            old_level = calculate_level(old_xp)[0]
+                            new_level = calculate_level(new_xp)[0]
+                            if new_level > old_level:
+                                level_ups.append((server_id, user_id, old_level, new_level))
+                    
+                    for level_up in level_ups:
+                        await self._notify_level_up(conn, *level_up)
+            except BaseException:
+                # Put the batch back so the next flush retries it
+                for key, (xp, coins) in batch.items():
+                    entry = self._pending.setdefault(key, [0, 0])
+                    entry[0] += xp
+                    entry[1] += coins
+                raise
+            
+            for server_id, user_id, new_xp in totals:
+                xp_leaderboard.record(server_id, user_id, new_xp)
+                profile_cache.invalidate_user(user_id)
+            return len(batch)
+
+    async def _notify_level_up(self, conn, server_id: str, user_id: str, old_level: int, new_level: int):
+        """Run level up listeners, rolling back only the listener that failed"""
+        for listener in list(self._listeners):
+            await conn.execute("SAVEPOINT level_up")
+            try:
+                await listener(conn, server_id, user_id, old_level, new_level)
+            except Exception as e:
+                await conn.execute("ROLLBACK TO level_up")
+                await self._log(f"Level up reward failed for {user_id}: {type(e).__name__}: {str(e)}")
+            finally:
+                await conn.execute("RELEASE level_up")
+
+    async def _log(self, message: str):
+        if self.logger:
+            await self.logger.log(message, level="error")
+        else:
+            print(message)
\ No newline at end of file